@@ -0,0 +1,82 @@
+"""Compares two benchmark runs and flags regressions.
+
+    python -m benchmarks.compare old.json new.json --threshold 0.1
+
+exits with status 1 if a case got slower than the threshold allows
+
+"""
+
+import argparse
+import json
+import sys
+
+# keys that identify a benchmark case
+CASE_KEYS = ("stage", "file", "points", "strokes", "backend", "speed")
+
+
+def case_id(result):
+    """returns the identity of a benchmark case"""
+
+    return tuple((key, result[key]) for key in CASE_KEYS if key in result)
+
+
+def load(file_path):
+    """loads the timed results of a benchmark run by case"""
+
+    with open(file_path) as file:
+        results = json.load(file)["results"]
+
+    return {case_id(result): result for result in results
+            if "seconds" in result}
+
+
+def compare(old, new, threshold, min_time):
+    """prints the comparison of two runs and
+    returns the number of regressions"""
+
+    regressions = 0
+    for case in sorted(old.keys() & new.keys(), key=str):
+        ratio = new[case]["seconds"] / max(old[case]["seconds"], 1e-9)
+
+        # timings too short to be compared reliably
+        if max(old[case]["seconds"], new[case]["seconds"]) < min_time:
+            flag = "too short"
+        elif ratio > 1 + threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "faster"
+        else:
+            flag = ""
+        name = " ".join(str(value) for key, value in case)
+        print("{:<45} {:>9.3f}s {:>9.3f}s {:>6.2f}x {}".format(
+            name, old[case]["seconds"], new[case]["seconds"], ratio, flag))
+
+    for case in old.keys() - new.keys():
+        print(" ".join(str(value) for key, value in case), "missing in new run")
+    for case in new.keys() - old.keys():
+        print(" ".join(str(value) for key, value in case), "missing in old run")
+
+    return regressions
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old", help="JSON results of the reference run")
+    parser.add_argument("new", help="JSON results of the new run")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown flagged as a regression")
+    parser.add_argument("--min-time", type=float, default=0.01,
+                        help="seconds under which timings are not compared")
+    args = parser.parse_args()
+
+    regressions = compare(load(args.old), load(args.new), args.threshold,
+                          args.min_time)
+    print(regressions, "regression(s)")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
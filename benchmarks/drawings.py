@@ -0,0 +1,36 @@
+import numpy as np
+
+BOARD_SIZE = 650
+
+
+def synthetic_drawing(points, strokes=1, seed=0):
+    """Generates a reproducible hand-drawing-like point list.
+
+    The drawing is made of strokes of smoothly turning paths
+    with one pixel between successive points, like the points
+    added by manual drawing, starting at random board positions.
+
+    """
+
+    random = np.random.RandomState(seed)
+    strokes = max(1, min(strokes, points))
+    lengths = np.full(strokes, points // strokes)
+    lengths[:points % strokes] += 1
+
+    drawing = []
+    for length in lengths:
+
+        # smoothly varying turning rate
+        turns = np.cumsum(random.normal(0, 0.002, length))
+        turns += random.uniform(-0.03, 0.03)
+        angles = random.uniform(0, 2 * np.pi) + np.cumsum(turns)
+
+        start = complex(*random.uniform(-BOARD_SIZE / 3, BOARD_SIZE / 3, 2))
+        stroke = start + np.cumsum(np.exp(1j * angles))
+
+        # keep the stroke inside the board
+        stroke = np.clip(stroke.real, -BOARD_SIZE / 2, BOARD_SIZE / 2) \
+            + 1j * np.clip(stroke.imag, -BOARD_SIZE / 2, BOARD_SIZE / 2)
+        drawing.append(stroke)
+
+    return np.concatenate(drawing)
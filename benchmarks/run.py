@@ -0,0 +1,279 @@
+"""Benchmarks the import, transform, render and export stages.
+
+Every case runs in a fresh headless process so that its peak memory
+is measured on its own. Run from the repository root:
+
+    python -m benchmarks.run -o results.json
+    python -m benchmarks.compare old.json results.json
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+SAMPLE_SVG = os.path.join("samples", "sample.svg")
+DEFAULT_POINTS = [1000, 5000, 20000]
+DEFAULT_SPEEDS = [5, 20]
+DEFAULT_STROKES = 4
+
+# the pure-Python transform is only timed on small drawings
+REFERENCE_LIMIT = 2000
+
+
+def _windows_peak_rss_mb():
+    """returns the peak working set of the process in MB on Windows,
+    or None if it cannot be read"""
+
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.WinDLL("kernel32")
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    kernel32.K32GetProcessMemoryInfo.argtypes = [
+        wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters),
+        wintypes.DWORD]
+    if not kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(),
+                                            ctypes.byref(counters),
+                                            counters.cb):
+        return None
+
+    return counters.PeakWorkingSetSize / 1024 ** 2
+
+
+def peak_rss_mb():
+    """returns the peak resident memory of the process in MB,
+    or None if it cannot be measured on this platform"""
+
+    if sys.platform == "win32":
+        return _windows_peak_rss_mb()
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # bytes on macOS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / 1024 ** 2
+    return peak / 1024
+
+
+def headless_layer():
+    """creates the Crisnian layer without a display"""
+
+    from crisnian_code import headless as h_l
+    from crisnian_code import render_cache as r_c
+
+    c_layer = h_l.headless_layer()
+
+    # never reuse results from the disk cache
+    c_layer.animation.set_cache(r_c.RenderCache(tempfile.mkdtemp()))
+
+    return c_layer
+
+
+def load_drawing(c_layer, case):
+    """loads the synthetic drawing of a case into the manual drawing"""
+
+    from benchmarks import drawings
+
+    points = drawings.synthetic_drawing(case["points"], case["strokes"])
+    c_layer.manual.expand(points.tolist())
+    c_layer.animation.no_render()
+
+
+def render(c_layer):
+    """renders the animation and waits for the end of rendering"""
+
+    animation = c_layer.animation
+    animation.no_render()
+    animation.render()
+    animation.wait_rendering()
+
+
+def run_case(case):
+    """runs one benchmark case in this process"""
+
+    from crisnian_code import jobs
+
+    c_layer = headless_layer()
+    stage = case["stage"]
+    timings = []
+
+    for _ in range(case["repeat"]):
+
+        if stage == "import":
+            start = time.perf_counter()
+            point_list = c_layer.file_manager.load_svg(jobs.Job("import"),
+                                                       case["file"])
+            c_layer.file_manager.set_drawing(point_list)
+            timings.append(time.perf_counter() - start)
+
+        elif stage == "transform":
+            from crisnian_code import fourier_transform as f_t
+            from benchmarks import drawings
+
+            points = drawings.synthetic_drawing(case["points"],
+                                                case["strokes"])
+            start = time.perf_counter()
+            f_t.fourier_transform(points, jobs.Job("transform"), 50,
+                                  case["backend"])
+            timings.append(time.perf_counter() - start)
+
+        elif stage == "render":
+            load_drawing(c_layer, case)
+            c_layer.animation.set_speed(case["speed"])
+            start = time.perf_counter()
+            render(c_layer)
+            timings.append(time.perf_counter() - start)
+
+        elif stage == "export":
+            load_drawing(c_layer, case)
+            c_layer.animation.set_speed(case["speed"])
+            render(c_layer)
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                c_layer.file_manager.write_video(
+                    jobs.Job("export"),
+                    [os.path.join(directory, "render.mp4")])
+                timings.append(time.perf_counter() - start)
+
+        elif stage == "pipeline":
+            load_drawing(c_layer, case)
+            c_layer.animation.set_speed(case["speed"])
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                c_layer.file_manager.render_video(
+                    jobs.Job("export"),
+                    [os.path.join(directory, "render.mp4")])
+                timings.append(time.perf_counter() - start)
+
+        c_layer.manual.point_list().clear()
+        c_layer.manual.live_transform().reset()
+
+    result = dict(case)
+    result["seconds"] = min(timings)
+    result["timings"] = timings
+    result["peak_rss_mb"] = peak_rss_mb()
+
+    return result
+
+
+def cases(args):
+    """lists the benchmark cases"""
+
+    listed = []
+    for svg in args.svg:
+        listed.append({"stage": "import", "file": svg, "repeat": args.repeat})
+
+    for points in args.points:
+        base = {"points": points, "strokes": args.strokes}
+        for backend in args.backends:
+            if backend == "reference" and points > REFERENCE_LIMIT:
+                continue
+            listed.append(dict(base, stage="transform", backend=backend,
+                               repeat=args.repeat))
+        for speed in args.speeds:
+            for stage in ("render", "export", "pipeline"):
+                listed.append(dict(base, stage=stage, speed=speed,
+                                   repeat=1))
+
+    return listed
+
+
+def metadata():
+    """describes the machine and libraries of the run"""
+
+    import numpy
+    import pygame
+
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pygame": pygame.version.ver,
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", default="bench_output.json",
+                        help="JSON file receiving the results")
+    parser.add_argument("--points", type=int, nargs="+",
+                        default=DEFAULT_POINTS,
+                        help="sizes of the synthetic drawings")
+    parser.add_argument("--speeds", type=int, nargs="+",
+                        default=DEFAULT_SPEEDS, help="animation speeds")
+    parser.add_argument("--strokes", type=int, default=DEFAULT_STROKES,
+                        help="strokes of the synthetic drawings")
+    parser.add_argument("--backends", nargs="+",
+                        default=["numpy", "reference"],
+                        help="Fourier backends of the transform stage")
+    parser.add_argument("--svg", nargs="*", default=[SAMPLE_SVG],
+                        help="svg files of the import stage")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="repeats of the import and transform stages")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # run a single case and print its result
+    if args.case is not None:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    results = []
+    for case in cases(args):
+        print("running", json.dumps(case), flush=True)
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--case",
+             json.dumps(case)], capture_output=True, text=True)
+        if process.returncode != 0:
+            print(process.stderr, file=sys.stderr)
+
+            # a killed case may not have written any error
+            lines = process.stderr.strip().splitlines()
+            error = lines[-1] if lines else \
+                "exited with status {}".format(process.returncode)
+            result = dict(case, error=error)
+        else:
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            peak = result["peak_rss_mb"]
+            print("  {:.3f}s, peak {}".format(
+                result["seconds"],
+                "n/a" if peak is None else "{:.1f} MB".format(peak)),
+                flush=True)
+        results.append(result)
+
+    with open(args.output, "w") as file:
+        json.dump({"metadata": metadata(), "results": results}, file,
+                  indent=2)
+
+
+if __name__ == '__main__':
+    main()
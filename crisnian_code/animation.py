@@ -1,16 +1,17 @@
 import threading
-import cmath
-from pygui import colors as col, drawing_functions as d_f
+import time
+import numpy as np
 import pygame
-from utility_functions import geometrical_functions as g_f
-from crisnian_code import layer_utilities as l_u
+from crisnian_code import fourier_transform as f_t
+from crisnian_code import render_cache as r_c
+from crisnian_code import resampling as r_s
+from crisnian_code import epicycles as e_c
+from crisnian_code import frames as f_r
+from crisnian_code import frame_schedule as f_s
+from crisnian_code import jobs
 import tkinter as tk
 from tkinter import simpledialog
 
-BLACK = col.BLACK
-GREEN = col.GREEN
-RED = col.RED
-
 
 class Animation:
     """generates and stores screen animation
@@ -26,31 +27,101 @@ class Animation:
         self._manual = manual
         self._size = size[1], size[1]
         self._rendered = False
-        self._rendering = False
         self._layer = layer
         self._asking = False
+        self._fourier_backend = f_t.DEFAULT_BACKEND
+        self._precision = f_t.DEFAULT_PRECISION
+        self._harmonics = None  # number of kept harmonics (None for all)
+        self._energy_fraction = None  # kept spectral energy (None for all)
+        self._cull = 0  # radius in pixels under which clocks are summed
+        self._adaptive = False  # frames follow the tip motion
+        self._cache = r_c.RenderCache()
+        self._samples = None  # resampled points count ("fft", None for all)
+        self._transform = manual.live_transform()  # transformed points
+        self._breaks = []  # stroke start of each transformed point
+        self._per_stroke = False  # transform each stroke separately
+        self._frame_mode = "stored"  # how frames are kept (f_r.FRAME_MODES)
+        self._raster_workers = f_r.RASTER_WORKERS  # stored frames drawers
+        self._render_job = None  # job of the current render
+        self._truncation = None  # reconstruction error and kept clocks
+        self._deviation = None  # deviation from double precision
+        self._timings = {}  # seconds taken by the stages of the last render
+        self._scene = None  # frames description of the last render
+        self._producer = None  # frames drawer of lazy playback
+        self._shown = None  # last frame shown in lazy playback
+        self._descriptors = []  # frame descriptors of compact playback
+        self._trail = None  # shared clock drawing of compact playback
+        self._composed = None  # index and surface of the last composed frame
 
     def non_empty(self):
         """checks if the animation is not empty"""
 
-        return len(self._frames) > 0
+        return self.frame_count() > 0
+
+    def frame_count(self):
+        """returns the number of frames"""
+
+        if self._producer is not None:
+            return self._scene.frame_count()
+        if self._descriptors:
+            return len(self._descriptors)
+        return len(self._frames)
 
     def frame(self):
         """returns current frame"""
 
+        # show the last drawn frame if the current one is not ready
+        if self._producer is not None:
+            frame = self._producer.get(self._frame)
+            if frame is not None:
+                self._shown = frame
+            return self._shown
+
+        # compose the current frame on top of the shared clock drawing
+        if self._descriptors:
+            if self._composed is None or self._composed[0] != self._frame:
+                frame = self._scene.compose(self._trail, self._frame,
+                                            self._descriptors[self._frame])
+                self._composed = self._frame, frame
+            return self._composed[1]
+
         return self._frames[self._frame]
 
+    def iter_frames(self):
+        """yields every frame in order"""
+
+        if self._producer is not None:
+            return self._scene.iter_frames()
+        if self._descriptors:
+            return self._iter_composed()
+        return iter(self._frames)
+
+    def _iter_composed(self):
+        """yields every frame composed from its descriptor"""
+
+        scene = self._scene
+        descriptors = self._descriptors
+        trail = f_r.TrailCursor(scene)
+        for i, descriptor in enumerate(descriptors):
+            yield scene.compose(trail, i, descriptor)
+
     def next(self):
         """advances the animation"""
 
+        # wait for the next frame if it is not drawn yet
+        if self._producer is not None \
+                and not self._producer.is_ready(self._frame + 1) \
+                and self._frame + 1 < self.frame_count():
+            return
+
         # advance the frame based on animation speed
-        self._frame = min(self._frame + 1, len(self._frames) - 1)
+        self._frame = min(self._frame + 1, self.frame_count() - 1)
 
         # update animation percentage
         self.display_animation_percentage()
 
         # pause if the last frame is reached
-        if self._frame == len(self._frames) - 1:
+        if self._frame == self.frame_count() - 1:
             self.pause()
             self._layer.layer_objects["label play%"].text = "100%"
 
@@ -58,6 +129,13 @@ class Animation:
         """clears all frames"""
 
         self._frames.clear()
+        if self._producer is not None:
+            self._producer.stop()
+        self._producer = None
+        self._scene = None
+        self._descriptors = []
+        self._trail = None
+        self._composed = None
 
     def restart(self):
         """restarts animation"""
@@ -91,15 +169,119 @@ class Animation:
         self.enable_speed(False)
 
         # start rendering the clock animation
-        self._rendering = True
+        self._prepare_points()
+        self._render_job = self._layer.jobs.submit(
+            "render", self._render_animation,
+            on_progress=self.show_progress, on_end=self._render_ended)
+
+        return self._render_job
+
+    def _prepare_points(self):
+        """resamples the drawing points if requested
+        and looks for their coefficients in the disk cache"""
+
+        # get manual points and save their font
+        live = self._manual.live_transform()
+        fonts = [font for point, font in self._manual.point_list()]
+
+        # resample manual points by arc length if requested
+        if self._samples is None:
+            self._transform = live
+            self._fonts = fonts
+            self._breaks = r_s.stroke_breaks(live.points())
+        else:
+            points, self._fonts, self._breaks = r_s.resample(
+                live.points(), fonts, self.point_count())
+            self._transform = f_t.LiveTransform()
+            self._transform.reset(points)
+
+        # look for the coefficients of this drawing in the disk cache
+        transform = self._transform
+        if not self._per_stroke and transform.is_dirty(self._fourier_backend,
+                                                       self._precision):
+            cached = self._cache.load_coefficients(self.coefficients_key())
+            if cached is not None:
+                transform.set_coefficients(cached,
+                                           self._fourier_backend,
+                                           self._precision)
+
+    def render_scene(self, job):
+        """Computes the clocks of the animation in the thread of a job
+        without drawing or keeping any frame, so that frames
+        can be drawn straight into a video file
+
+        the animation must have been marked as not rendered
+
+        returns the scene describing every frame,
+        or None if rendering was stopped
+
+        """
+
+        job.set_stage("render")
+        self._prepare_points()
+        self._timings = {}
+
+        start_time = time.perf_counter()
+        clock_sizes = self._compute_coefficients(job, 100)
+        if clock_sizes is None:
+            return None
+        self._timings["transform"] = time.perf_counter() - start_time
+
+        scene = self._build_scene(clock_sizes)
+        job.progress(100)
+
+        return scene
+
+    def wait_rendering(self):
+        """waits for the end of the current render,
+        handling job events in this thread"""
 
-        # get list of manual points and save their font
-        points_only = [point for point, font in self._manual.point_list()]
-        self._fonts = [font for point, font in self._manual.point_list()]
+        if self._render_job is not None:
+            self._layer.jobs.wait(self._render_job)
 
-        # start rendering
-        threading.Thread(target=self._render_animation,
-                         args=(points_only,)).start()
+    def cancel_rendering(self):
+        """stops the current render"""
+
+        if self._render_job is not None:
+            self._render_job.cancel()
+
+    def show_progress(self, event):
+        """displays the progress of a render job"""
+
+        if event.stage == "render":
+            self.display_rendering_percentage(event.percent)
+
+    def display_render_results(self):
+        """displays the reconstruction error and precision deviation
+        of the last computed clocks"""
+
+        if self._truncation is not None:
+            self.display_truncation_error(*self._truncation)
+        self.display_precision_deviation(self._deviation)
+
+    def _render_ended(self, event):
+        """marks the animation as rendered and enables actions
+        that compromise or require rendering, once the render job ended"""
+
+        self._render_job = None
+
+        if isinstance(event, jobs.Finished):
+            self.display_render_results()
+            self.display_rendering_percentage(100)
+            self._layer.file_manager.enable_exporting(True)
+            self.enable_playing(True)
+            self.enable_restarting(True)
+            self._rendered = True
+        else:
+            if isinstance(event, jobs.Failed):
+                jobs.print_error(event)
+            self.clear()
+            self.display_rendering_percentage(0)
+            self.enable_rendering(True)
+
+        self._manual.enable_clearing(True)
+        self._layer.file_manager.enable_importing(True)
+        self.enable_speed(True)
 
     def play(self):
         """either starts playing the animation or pauses it"""
@@ -109,7 +291,7 @@ class Animation:
         if not self._playing and self._rendered and not self.is_rendering():
 
             # reset animation if it reached the end
-            if self._frame == len(self._frames) - 1:
+            if self._frame == self.frame_count() - 1:
                 self._frame = 0
 
                 # update animation percentage
@@ -134,9 +316,13 @@ class Animation:
         self.clear()
         self._rendered = False
         self._frame = 0
+        self._truncation = None
+        self._deviation = None
         self.display_rendering_percentage(0)
         self.display_animation_percentage()
         self._layer.layer_objects["label export%"].text = "0%"
+        self._layer.layer_objects["label error"].text = ""
+        self._layer.layer_objects["label deviation"].text = ""
 
         # disable actions that require a render
         self._layer.file_manager.enable_exporting(False)
@@ -153,138 +339,267 @@ class Animation:
 
         self._layer.layer_objects["label render%"].text = str(percent) + "%"
 
+    def display_truncation_error(self, error, clocks):
+        """displays reconstruction error of the kept clocks"""
+
+        if self._harmonics is None and self._energy_fraction is None:
+            text = ""
+        else:
+            text = str(clocks) + " ±" + str(round(error, 1)) + "px"
+        self._layer.layer_objects["label error"].text = text
+
+    def display_precision_deviation(self, deviation):
+        """displays the maximum deviation of the clock drawing
+        from its double precision version"""
+
+        if deviation is None:
+            text = ""
+        else:
+            text = "Δ" + format(deviation, ".2g") + "px"
+        self._layer.layer_objects["label deviation"].text = text
+
     def display_animation_percentage(self):
         """displays animation percentage"""
 
         if self.non_empty():
-            percent = int(100 * self._frame / len(self._frames))
+            percent = int(100 * self._frame / self.frame_count())
         else:
             percent = 0
         self._layer.layer_objects["label play%"].text = str(percent) + "%"
 
-    def _render_animation(self, points_only):
-        """Creates the clock drawing animation.
+    def _render_animation(self, job):
+        """Creates the clock drawing animation in the thread of its job.
         Get clock coefficient with fourier analysis,
         then draw stack clocks to draw"""
 
         # ratio for how much computation time fourier analysis takes
         # relatively to screen drawing (measured empirically)
         ratio = 126/(self._animation_speed+2.1)
+        if self._fourier_backend != "reference":
+            ratio = ratio / 100
 
         # percentage of computation time fourier analysis takes
         # relatively to screen drawing (measured empirically)
         percent_split = 100/(ratio+1)
 
-        # compute clock coefficients using fourier analysis
-        clock_sizes = []
-        fourier = l_u.discrete_fourier_transform
-        fourier(points_only, clock_sizes,
-                self._layer.g_u_i, self, percent_split)
+        self._timings = {}
+        start_time = time.perf_counter()
+
+        clock_sizes = self._compute_coefficients(job, percent_split)
 
         # stop rendering if requested
-        if self._layer.g_u_i.quit_request:
+        if clock_sizes is None:
             return
 
+        self._timings["transform"] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+
         # clear any previous animation
         self.clear()
 
-        # number of clocks
-        N = len(clock_sizes)
+        # everything needed to draw the frames of the animation
+        self._scene = self._build_scene(clock_sizes)
 
-        # board that records the clock drawing
-        drawing_board = pygame.Surface(self._size, pygame.SRCALPHA)
+        # draw frames on demand during playback
+        if self._frame_mode == "lazy":
+            self._producer = f_r.FrameProducer(self._scene,
+                                               self._layer.g_u_i)
+            self._shown = pygame.Surface(self._size, pygame.SRCALPHA)
 
-        # go through every drawing point
-        for k in range(N):
+        # store frames as descriptors of their clock drawing length
+        # and clock positions, composed with a shared clock drawing
+        elif self._frame_mode == "compact":
+            frame_count = self._scene.frame_count()
+            descriptors = []
+            for i, descriptor in enumerate(self._scene.descriptors()):
 
-            # stop rendering if requested
-            if self._layer.g_u_i.quit_request:
-                return
+                # stop rendering if requested
+                if job.quit_request:
+                    return
 
-            # get color and size from font
-            color = self._fonts[k][0]
-            size = self._fonts[k][1]
+                # show new completion percentage
+                if i % 100 == 0:
+                    percent = int(percent_split
+                                  + (100-percent_split) * (i / frame_count))
+                    job.progress(percent)
 
-            # show new completion percentage
-            if k % self._animation_speed == 0:
-                percent = int(percent_split + (100-percent_split) * (k / N))
-                self.display_rendering_percentage(percent)
+                descriptors.append(descriptor)
 
-            # create new drawing frame
-            if k % self._animation_speed == 0:
-                frame_k = pygame.Surface(self._size, pygame.SRCALPHA)
-                frame_k.blit(drawing_board, (0, 0))
-            else:
-                frame_k = None
+            self._trail = f_r.TrailCursor(self._scene)
+            self._descriptors = descriptors
 
-            # draw clocks
-            new_center = 0
-            exp_base = cmath.exp(-2j * cmath.pi * k / N)
-            new_exp = exp_base ** (int(N / 2))
-            c_s = clock_sizes
-            for n, cof in enumerate(c_s[int(N / 2):] + c_s[:int(N / 2)]):
+        # draw and store all frames, in parallel for long animations
+        else:
+            frame_count = self._scene.frame_count()
+            frames = f_r.iter_parallel_frames(self._scene, job,
+                                              self._raster_workers)
+            for i, frame in enumerate(frames):
+
+                # stop rendering if requested
+                if job.quit_request:
+                    return
+
+                # show new completion percentage
+                percent = int(percent_split
+                              + (100-percent_split) * (i / frame_count))
+                job.progress(percent)
+
+                # add new frame to animation
+                self.add_frame(frame)
+
+        job.progress(100)
+        self._timings["frames"] = time.perf_counter() - start_time
+
+    def _compute_coefficients(self, job, percent_split):
+        """Computes the clock coefficients of the drawing points
+        using fourier analysis, reusing them if the drawing did not
+        change since the last render or if they are in the disk cache
+
+        returns None if rendering was stopped
+
+        """
+
+        transform = self._transform
+        if self._per_stroke:
+            cached = self._cache.load_coefficients(self.coefficients_key())
+            computed = cached is None \
+                or len(cached) != 2 * len(transform.points())
+            if computed:
+                clock_sizes = f_t.stroke_fourier_transform(
+                    transform.points(), self._breaks, job, percent_split,
+                    self._fourier_backend, self._precision)
+            else:
+                clock_sizes = cached.astype(f_t.PRECISIONS[self._precision])
+        else:
+            computed = transform.is_dirty(self._fourier_backend,
+                                          self._precision)
+            clock_sizes = transform.transform(job, percent_split,
+                                              self._fourier_backend,
+                                              self._precision)
 
-                # get size of clocks
-                cof_mod = l_u.c_mod(cof)
+        # stop rendering if requested
+        if clock_sizes is None or job.quit_request:
+            return None
 
-                # get new clock term
-                exp = cof * new_exp
+        # save new coefficients in the disk cache
+        if computed:
+            self._cache.store_coefficients(self.coefficients_key(),
+                                           clock_sizes)
 
-                proj_new_center = l_u.complex_to_board(self._size, new_center)
-                next_proj_center = l_u.complex_to_board(self._size,
-                                                        new_center + exp)
+        return clock_sizes
 
-                # only draw clocks if the frame will show up in the animation
-                if k % self._animation_speed == 0:
+    def _build_scene(self, clock_sizes):
+        """Selects the kept clocks of the coefficients and
+        returns the scene needed to draw every frame"""
 
-                    pygame.draw.circle(frame_k, BLACK, proj_new_center,
-                                       cof_mod, 2)
-                    # draw arrow to point and point in green
-                    if cof != 0:
-                        d_f.draw_arrow(frame_k, proj_new_center,
-                                       (exp.real, -exp.imag),
-                                       BLACK, cof_mod / 100)
-                    pygame.draw.circle(frame_k, GREEN, next_proj_center, 2, 0)
+        transform = self._transform
 
-                # update drawing reference
-                new_center += exp
-                new_exp *= exp_base
+        # number of points
+        N = len(transform.points())
 
-            # add an new line to the clock drawing if there was no jump
-            if k != 0 and g_f.distance_2d(next_proj_center, proj_old_center) < 5:
-                pygame.draw.line(drawing_board, color,
-                                 next_proj_center, proj_old_center, size)
+        # split the drawing into separately transformed segments
+        # as (first point, number of points, coefficients)
+        if self._per_stroke:
+            segments = [(start, end - start, clock_sizes[2*start:2*end])
+                        for start, end in f_t.stroke_bounds(self._breaks)]
+        else:
+            segments = [(0, N, clock_sizes)]
+
+        # only keep the clocks of the selected harmonics
+        indices = []
+        squared_error = 0
+        for start, count, coefficients in segments:
+            indices.append(f_t.select_harmonics(
+                coefficients, self._harmonics, self._energy_fraction))
+            error = f_t.truncation_error(coefficients, indices[-1])
+            squared_error += count * error ** 2
+        self._truncation = ((squared_error / N) ** 0.5,
+                            sum(len(i) for i in indices))
+
+        # clock drawing tip at every drawing point
+        dtype = f_t.PRECISIONS[self._precision]
+        tips = np.empty(N, dtype=dtype)
+        for (start, count, coefficients), kept in zip(segments, indices):
+            tips[start:start + count] = \
+                e_c.tip_trace(coefficients, kept, dtype)[:count]
+
+        # compare reduced precision tips with double precision ones
+        if dtype != np.complex128:
+            reference = f_t.double_precision_coefficients(
+                transform.points(), self._breaks if self._per_stroke else None)
+            reference_tips = np.empty(N, dtype=np.complex128)
+            for (start, count, coefficients), kept in zip(segments, indices):
+                reference_tips[start:start + count] = e_c.tip_trace(
+                    reference[2*start:2*start + len(coefficients)]
+                    if self._per_stroke else reference, kept)[:count]
+            self._deviation = e_c.trace_deviation(tips, reference_tips)
+        else:
+            self._deviation = None
+
+        tips = e_c.to_board(self._size, tips)
+
+        # spread as many frames as the animation speed gives
+        # along the motion of the drawing tip
+        frame_points = None
+        if self._adaptive:
+            frame_points = f_s.adaptive_frame_points(
+                tips, self._breaks, -(-N // self._animation_speed))
+
+        tips = tips.tolist()
+
+        # everything needed to draw the frames of the animation
+        segments = [(start, count, coefficients, kept) for
+                    (start, count, coefficients), kept in zip(segments,
+                                                              indices)]
+        return f_r.ClockScene(self._size, tips, self._breaks, self._fonts,
+                              segments, self._animation_speed, dtype,
+                              self._cull, frame_points)
+
+    def coefficients_key(self):
+        """returns the cache key of the clock coefficients"""
+
+        if self._per_stroke:
+            return r_c.key(self._transform.points(), self._fourier_backend,
+                           self._precision, "strokes")
+        return r_c.key(self._transform.points(), self._fourier_backend,
+                       self._precision)
+
+    def trail_key(self):
+        """returns the content key of everything
+        the final drawing depends on"""
+
+        return r_c.key(self._transform.points(),
+                       r_c.font_array(self._fonts), self._fourier_backend,
+                       self._precision,
+                       self._harmonics, self._energy_fraction, self._size,
+                       self._per_stroke)
+
+    def render_parameters(self):
+        """returns everything the frames of the animation depend on,
+        to check that an interrupted export can be resumed"""
+
+        return {"key": self.trail_key(), "speed": self._animation_speed,
+                "cull": self._cull, "adaptive": self._adaptive}
+
+    def cache(self):
+        """getter"""
 
-            proj_old_center = next_proj_center
+        return self._cache
 
-            # print clock drawing tip in red
-            if k % self._animation_speed == 0:
-                pygame.draw.circle(frame_k, RED, next_proj_center, 2, 0)
+    def set_cache(self, cache):
+        """setter"""
 
-            # add new frame to animation
-            if k % self._animation_speed == 0:
-                self.add_frame(frame_k)
+        self._cache = cache
 
-        # add a frame with only the final drawing
-        self.add_frame(drawing_board)
+    def is_rendering(self):
+        """checks if a render job is running"""
 
-        self.display_rendering_percentage(100)
+        return self._render_job is not None
 
-        # mark the animation as rendered and enable actions
-        # that compromise or require rendering
-        self._rendering = False
-        self._layer.file_manager.enable_exporting(True)
-        self._manual.enable_clearing(True)
-        self.enable_playing(True)
-        self.enable_restarting(True)
-        self._layer.file_manager.enable_importing(True)
-        self.enable_speed(True)
-        self._rendered = True
-
-    def is_rendering(self):
+    def timings(self):
         """getter"""
 
-        return self._rendering
+        return self._timings
 
     def is_rendered(self):
         """getter"""
@@ -310,7 +625,7 @@ class Animation:
         """asks the user for the animation speed"""
 
         # cannot change speed while rendering or exporting or importing
-        if self._rendering or self._layer.file_manager.is_exporting():
+        if self.is_rendering() or self._layer.file_manager.is_exporting():
             return
 
         self.pause()
@@ -329,6 +644,244 @@ class Animation:
         self.update_time()
         self._asking = False
 
+    def harmonics(self):
+        """launches harm"""
+
+        # cannot change harmonics while rendering or exporting
+        if not self._asking and not self.is_rendering()\
+                and not self._layer.file_manager.is_exporting():
+
+            self._asking = True
+            self.enable_rendering(False)
+            self._layer.file_manager.enable_exporting(False)
+            threading.Thread(target=self.harm).start()
+
+    def harm(self):
+        """asks the user for the number of harmonics
+        or the fraction of spectral energy to keep"""
+
+        self.pause()
+
+        # ask user of harmonics
+        root = tk.Tk()
+        root.withdraw()
+        answer = simpledialog.askstring(
+            "Input", "Harmonics? (count, energy % like 99.5%, or all)",
+            initialvalue=self.harmonics_text())
+        root.destroy()
+
+        if answer is not None:
+            answer = answer.strip()
+            try:
+                if answer == "" or answer == "all":
+                    self._harmonics = None
+                    self._energy_fraction = None
+                elif answer.endswith("%"):
+                    self._harmonics = None
+                    self._energy_fraction = float(answer[:-1]) / 100
+                else:
+                    self._harmonics = max(0, int(answer))
+                    self._energy_fraction = None
+            except ValueError:
+                pass
+
+        self.no_render()
+        self._asking = False
+
+    def samples(self):
+        """launches samp"""
+
+        # cannot change points while rendering or exporting
+        if not self._asking and not self.is_rendering()\
+                and not self._layer.file_manager.is_exporting():
+
+            self._asking = True
+            self.enable_rendering(False)
+            self._layer.file_manager.enable_exporting(False)
+            threading.Thread(target=self.samp).start()
+
+    def samp(self):
+        """asks the user for the number of points
+        the drawing is resampled to"""
+
+        self.pause()
+
+        # ask user of number of points
+        root = tk.Tk()
+        root.withdraw()
+        answer = simpledialog.askstring(
+            "Input", "Points? (count, fft, or all)",
+            initialvalue=str(self._samples or "all"))
+        root.destroy()
+
+        if answer is not None:
+            answer = answer.strip()
+            if answer == "" or answer == "all":
+                self._samples = None
+            elif answer == "fft":
+                self._samples = answer
+            else:
+                try:
+                    self._samples = max(2, int(answer))
+                except ValueError:
+                    pass
+
+        self.no_render()
+        self.update_time()
+        self._asking = False
+
+    def culling(self):
+        """launches cul"""
+
+        # cannot change culling while rendering or exporting
+        if not self._asking and not self.is_rendering()\
+                and not self._layer.file_manager.is_exporting():
+
+            self._asking = True
+            self.enable_rendering(False)
+            self._layer.file_manager.enable_exporting(False)
+            threading.Thread(target=self.cul).start()
+
+    def cul(self):
+        """asks the user for the radius under which clocks
+        are drawn as a single arrow"""
+
+        self.pause()
+
+        # ask user of culling radius
+        root = tk.Tk()
+        root.withdraw()
+        answer = simpledialog.askfloat(
+            "Input", "Smallest drawn clock? (pixels, 0 for all)",
+            minvalue=0, initialvalue=self._cull)
+        root.destroy()
+
+        if answer is not None:
+            self._cull = answer
+
+        self.no_render()
+        self._asking = False
+
+    def set_cull(self, cull):
+        """setter"""
+
+        self._cull = max(0, cull)
+
+    def strokes(self):
+        """toggles transforming each stroke separately"""
+
+        if self.is_rendering() or self._asking\
+                or self._layer.file_manager.is_exporting():
+            return
+
+        self._per_stroke = not self._per_stroke
+        self.no_render()
+
+    def adaptive(self):
+        """toggles frames following the motion of the drawing tip"""
+
+        if self.is_rendering() or self._asking\
+                or self._layer.file_manager.is_exporting():
+            return
+
+        self._adaptive = not self._adaptive
+        self.no_render()
+
+    def set_adaptive(self, value):
+        """setter"""
+
+        self._adaptive = value
+
+    def precision(self):
+        """toggles single precision rendering"""
+
+        if self.is_rendering() or self._asking\
+                or self._layer.file_manager.is_exporting():
+            return
+
+        if self._precision == "double":
+            self._precision = "single"
+        else:
+            self._precision = "double"
+        self.no_render()
+
+    def set_precision(self, precision):
+        """setter"""
+
+        if precision not in f_t.PRECISIONS:
+            raise ValueError("unknown precision: " + str(precision))
+        self._precision = precision
+
+    def frame_mode(self):
+        """switches to the next way of keeping frames"""
+
+        if self.is_rendering() or self._asking\
+                or self._layer.file_manager.is_exporting():
+            return
+
+        modes = f_r.FRAME_MODES
+        self._frame_mode = modes[(modes.index(self._frame_mode) + 1)
+                                 % len(modes)]
+        self.no_render()
+
+    def set_frame_mode(self, mode):
+        """setter"""
+
+        if mode not in f_r.FRAME_MODES:
+            raise ValueError("unknown frame mode: " + str(mode))
+        self._frame_mode = mode
+
+    def scene(self):
+        """returns the frames description of the last render"""
+
+        return self._scene
+
+    def raster_workers(self):
+        """getter"""
+
+        return self._raster_workers
+
+    def set_raster_workers(self, workers):
+        """setter"""
+
+        self._raster_workers = workers
+
+    def set_per_stroke(self, value):
+        """setter"""
+
+        self._per_stroke = value
+
+    def set_samples(self, samples):
+        """setter"""
+
+        self._samples = samples
+
+    def point_count(self):
+        """returns the number of points that
+        the animation goes through"""
+
+        count = len(self._manual.point_list())
+        if self._samples == "fft":
+            return r_s.fft_friendly(count)
+        if self._samples is not None:
+            return self._samples
+        return count
+
+    def harmonics_text(self):
+        """returns the harmonics setting as text"""
+
+        if self._energy_fraction is not None:
+            return str(100 * self._energy_fraction) + "%"
+        if self._harmonics is not None:
+            return str(self._harmonics)
+        return "all"
+
+    def set_harmonics(self, harmonics=None, energy_fraction=None):
+        """setter"""
+
+        self._harmonics = harmonics
+        self._energy_fraction = energy_fraction
+
     def asking(self):
         """getter"""
 
@@ -344,11 +897,28 @@ class Animation:
 
         return self._animation_speed
 
+    def set_speed(self, animation_speed):
+        """setter"""
+
+        self._animation_speed = max(1, int(animation_speed))
+
+    def fourier_backend(self):
+        """getter"""
+
+        return self._fourier_backend
+
+    def set_fourier_backend(self, backend):
+        """setter"""
+
+        if backend not in f_t.BACKENDS:
+            raise ValueError("unknown Fourier backend: " + str(backend))
+        self._fourier_backend = backend
+
     def update_time(self):
         """updates animation time"""
 
         # how long a video is based on number of frames
-        time = len(self._manual.point_list())/(20*self._animation_speed)
+        time = self.point_count()/(20*self._animation_speed)
 
         # generate time string from seconds
         if int(time % 60) < 10:
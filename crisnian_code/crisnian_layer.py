@@ -1,5 +1,5 @@
 from pygui import colors as col, layer
-from crisnian_code import animation, manual, file_manager
+from crisnian_code import animation, manual, file_manager, jobs
 from crisnian_code import layer_utilities as l_u
 from utility_functions import geometrical_functions as g_f
 import pygame
@@ -33,7 +33,10 @@ class CrisnianLayer(layer.Layer):
         # manual drawing
         self.manual = manual.Manual(self, self.size, MANUAL_DRAWING_ALPHA)
         self.font_selection = 0
-        
+
+        # background operations (rendering, importing, exporting)
+        self.jobs = jobs.JobScheduler(g_u_i)
+
         # clock drawing animation
         self.animation = animation.Animation(self, DEFAULT_FRAME_RATE,
                                              self.manual, self.size)
@@ -62,14 +65,18 @@ class CrisnianLayer(layer.Layer):
         f_m = self.file_manager
         layer_objects = {
             "animation": ("label", 20, 30, "Animation", True),
-            "speed": ("click", 135, 30, 1.3, "", an.speed, "speed", False),
+            "speed": ("click", 135, 30, 1.3, "", an.speed, "speed", False,
+                      an.harmonics, an.samples),
             "time": ("label", 160, 30, "0:00", True),
-            "render": ("click", 30, 70, 1.3, "Render", an.render, "render", True),
+            "render": ("click", 30, 70, 1.3, "Render", an.render, "render", True,
+                       f_m.render_exporting),
             "render%": ("label", 130, 70, "0%", True),
             "play/pause": ("toggle", 30, 110, 1.3, "Play/Pause", an.play,
                            "play", "pause", True, True),
             "play%": ("label", 170, 110, "0%", True),
             "restart": ("click", 30, 150, 1.3, "Restart", an.restart, "reset", True),
+            "error": ("label", 140, 150, "", False),
+            "deviation": ("label", 140, 175, "", False),
             "drawing": ("label", 20, 200, "Drawing", True, False),
             "show/hide": ("toggle", 30, 240, 1.3, "Show/Hide", m.show,
                           "hide", "show", False),
@@ -78,7 +85,8 @@ class CrisnianLayer(layer.Layer):
                            "erase", "draw", False),
             "file": ("label", 30, 540, "File", True),
             "import": ("click", 30, 580, 1.3, "Import", f_m.importing, "import", False),
-            "export": ("click", 30, 620, 1.3, "Export", f_m.exporting, "export", True),
+            "export": ("click", 30, 620, 1.3, "Export", f_m.exporting, "export", True,
+                       f_m.segment_exporting),
             "export%": ("label", 130, 620, "0%", True),
         }
 
@@ -102,9 +110,18 @@ class CrisnianLayer(layer.Layer):
                 if image is not None:
                     image = os.path.join("icons", o_i[6] + ".png")
 
+                # optional right and middle click actions
+                right = layer.EMP
+                if len(o_i) > 8:
+                    right = (o_i[8], ())
+                middle = layer.EMP
+                if len(o_i) > 9:
+                    middle = (o_i[9], ())
+
                 # generate object
                 obj = layer.Button(self, LIGHT_GREY, pos, 10 * o_i[3],
-                                   o_i[4], (o_i[5], ()), bold=True,
+                                   o_i[4], (o_i[5], ()), middle=middle,
+                                   right=right, bold=True,
                                    inv=True, image=image, disabled=o_i[7])
             # toggle buttons
             elif obj_type == "toggle":
@@ -218,6 +235,9 @@ class CrisnianLayer(layer.Layer):
         # asks for screen refresh
         self.g_u_i.to_draw_all()
 
+        # handle the progress and end of background operations
+        self.jobs.poll()
+
         # change font
         if self.font_selection == 1:
             self.manual.set_hue((cur_pos[0]-30)*(1/150))
@@ -296,6 +316,31 @@ class CrisnianLayer(layer.Layer):
         elif 30 < cur_pos[0] < 180 and 470 < cur_pos[1] < 500:
             self.font_selection = 4
 
+    def key_down(self, event, cur_pos):
+        """toggles per-stroke animation with the S key,
+        single precision rendering with the P key,
+        the way frames are kept with the L key,
+        frames following the drawing tip with the A key,
+        asks for the smallest drawn clock with the C key,
+        asks for the size of exported videos with the E key
+        and cancels rendering and exporting with the Escape key"""
+
+        if event.key == pygame.K_s:
+            self.animation.strokes()
+        elif event.key == pygame.K_p:
+            self.animation.precision()
+        elif event.key == pygame.K_l:
+            self.animation.frame_mode()
+        elif event.key == pygame.K_a:
+            self.animation.adaptive()
+        elif event.key == pygame.K_c:
+            self.animation.culling()
+        elif event.key == pygame.K_e:
+            self.file_manager.resolution()
+        elif event.key == pygame.K_ESCAPE:
+            self.animation.cancel_rendering()
+            self.file_manager.cancel()
+
     def gradientRect(self, left_colour, right_colour, target_rect):
         """ Draw a horizontal-gradient filled rectangle
         covering <target_rect> """
@@ -0,0 +1,78 @@
+import numpy as np
+
+# maximum number of clock positions computed at once
+BLOCK_SIZE = 1 << 20
+
+
+def tip_trace(coefficients, indices, dtype=np.complex128):
+    """Returns the clock drawing tip for every drawing point.
+
+    uses the formula:
+    Xk = sum[n in indices](xn*exp(-2*i*pi*k*n/N))
+
+    which is the FFT of the kept coefficients
+
+    """
+
+    coefficients = np.asarray(coefficients, dtype=dtype)
+    kept = np.zeros(len(coefficients), dtype=dtype)
+    kept[indices] = coefficients[indices]
+
+    return np.fft.fft(kept)
+
+
+def frame_blocks(coefficients, indices, frame_points, dtype=np.complex128):
+    """Yields the clock centers of the given drawing points
+    by blocks of bounded size, computed with the given complex type.
+
+    Each block is a pair of the drawing points of the block
+    and an array whose row j holds the K+1 stacked clock centers
+    (0 then every partial sum of the K kept clocks) at the j-th
+    drawing point of the block.
+
+    """
+
+    N = len(coefficients)
+    coefficients = np.asarray(coefficients, dtype=dtype)
+    indices = np.asarray(indices, dtype=np.int64)
+    kept = coefficients[indices]
+    angle = np.finfo(dtype).dtype.type(-2 * np.pi / N)
+    frame_points = np.asarray(frame_points, dtype=np.int64)
+
+    rows = max(1, BLOCK_SIZE // max(len(indices), 1))
+    for start in range(0, len(frame_points), rows):
+        ks = frame_points[start:start + rows]
+
+        # rotated clocks, with exact integer phases
+        phases = np.outer(ks, indices) % N
+        clocks = kept * np.exp(1j * (phases.astype(angle.dtype) * angle))
+
+        # stack the clocks on top of each other
+        centers = np.zeros((len(ks), len(indices) + 1), dtype=dtype)
+        np.cumsum(clocks, axis=1, out=centers[:, 1:])
+
+        yield ks, centers
+
+
+def to_board(size, z):
+    """gives the board coordinates of an array of complex numbers
+    as an array of (x, y) pairs"""
+
+    board = np.empty(np.shape(z) + (2,))
+    board[..., 0] = size[0] - size[1] / 2 + np.real(z)
+    board[..., 1] = size[1] / 2 - np.imag(z)
+
+    return board
+
+
+def trace_deviation(tips, reference_tips):
+    """returns the maximum distance in pixels between
+    two clock drawing traces"""
+
+    if len(tips) == 0:
+        return 0.0
+
+    difference = np.asarray(tips, dtype=np.complex128) \
+        - np.asarray(reference_tips, dtype=np.complex128)
+
+    return float(np.max(np.abs(difference)))
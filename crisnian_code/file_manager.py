@@ -1,18 +1,30 @@
 import pygame
 from pygui import colors as col
+from crisnian_code import video as v_d
+from crisnian_code import frames as f_r
+from crisnian_code import supersample as s_s
+from crisnian_code import segments as s_g
+from crisnian_code import jobs
 import os
-import cv2
 import threading
 from scipy.integrate import quad
 
 import tkinter as tk
 from tkinter import filedialog
 from tkinter import messagebox
+from tkinter import simpledialog
 
 import svgelements
 
 WHITE = col.WHITE
 
+# formats offered by the export dialog
+EXPORT_FILE_TYPES = [("mp4", '*.mp4'), ("webm", '*.webm'),
+                     ("gif", '*.gif'), ("png sequence", '*.png')]
+
+# formats offered when encoding by segments
+SEGMENT_FILE_TYPES = EXPORT_FILE_TYPES[:2] + EXPORT_FILE_TYPES[3:]
+
 
 class FileManager:
 
@@ -20,23 +32,35 @@ class FileManager:
         self._layer = layer
         self._manual = manual
         self._animation = animation
-        self._exporting = False
-        self._importing = False
+        self._export_job = None  # job of the current export
+        self._import_job = None  # job of the current import
+
+        # side of exported frames (None for the board)
+        # and supersampling factor
+        self._export_side = None
+        self._supersample = 1
+        # seconds the final drawing is held for and largest
+        # channel difference of frames repeating the previous one
+        self._hold = 0
+        self._hold_tolerance = v_d.HOLD_TOLERANCE
+        self._asking = False
 
     def importing(self):
         """launch importing"""
 
-        if not self._importing and not self._exporting\
+        if not self.is_importing() and not self.is_exporting()\
                 and not self._layer.animation.asking()\
+                and not self._asking\
                 and not self._animation.is_rendering():
 
-            self._importing = True
             self.enable_exporting(False)
             self._animation.enable_rendering(False)
-            threading.Thread(target=self.imp).start()
+            self._import_job = self._layer.jobs.submit(
+                "import", self.imp, on_end=self._import_ended)
 
-    def imp(self):
-        """Import svg file"""
+    def imp(self, job):
+        """Import svg file in the thread of its job,
+        returns its points or None if no file was chosen"""
 
         # Create temp directory if it does not exist
         if not os.path.exists("samples"):
@@ -51,19 +75,44 @@ class FileManager:
         root.destroy()
 
         if file_path is None or file_path == "":
-            self._importing = False
-            return
+            return None
 
-        if not file_path.endswith(".svg"):
-            root = tk.Tk()
-            root.withdraw()
-            messagebox.showerror('Loading error', 'File is not of svg type')
-            root.destroy()
-            self._importing = False
-            return
+        return self.load_svg(job, file_path)
+
+    def _import_ended(self, event):
+        """enables the actions disabled by importing,
+        once the import job ended"""
+
+        self._import_job = None
 
-        # clear manual drawing
-        self._layer.manual.clear()
+        if isinstance(event, jobs.Finished) and event.result is not None:
+            self.set_drawing(event.result)
+        elif isinstance(event, jobs.Failed):
+            if isinstance(event.error, ValueError):
+                self.show_error('Loading error', event.error)
+            else:
+                jobs.print_error(event)
+
+        self.enable_exporting(self._animation.is_rendered())
+        self._animation.enable_rendering(
+            not self._animation.is_rendered()
+            and len(self._manual.point_list()) > 1)
+
+    def load_svg(self, job, file_path):
+        """Reads the paths of an svg file as manual drawing points,
+        stopping early on the quit request of a job
+
+        only reads the file, so that it can run in the thread of
+        a job while set_drawing shows the points in the UI thread
+
+        returns the (point, font) list of the drawing,
+        or None if importing was stopped,
+        raises ValueError if the file is not a path-based svg
+
+        """
+
+        if not file_path.endswith(".svg"):
+            raise ValueError('File is not of svg type')
 
         my_svg = svgelements.SVG.parse(file_path)
 
@@ -81,12 +130,7 @@ class FileManager:
         paths = unpack(my_svg, 0)
 
         if len(paths) == 0:
-            root = tk.Tk()
-            root.withdraw()
-            messagebox.showerror('Loading error', 'SVG has no paths')
-            root.destroy()
-            self._importing = False
-            return
+            raise ValueError('SVG has no paths')
 
         # get first list of points
         pre_points = []
@@ -94,8 +138,8 @@ class FileManager:
             for element in path:
 
                 # stop importing if requested
-                if self._layer.g_u_i.quit_request:
-                    return
+                if job.quit_request:
+                    return None
 
                 if isinstance(element, svgelements.Line) \
                         or isinstance(element, svgelements.QuadraticBezier) \
@@ -103,6 +147,9 @@ class FileManager:
                     pre_points.append(element.start)
                     pre_points.append(element.end)
 
+        # side of the board the drawing is fitted to
+        board = self._layer.size[1]
+
         # get first limits of drawing
         minn = min([min(j.real, j.imag) for j in pre_points])
         maxx = max([max(j.real, j.imag) for j in pre_points])
@@ -113,14 +160,14 @@ class FileManager:
             for element in path:
 
                 # stop importing if requested
-                if self._layer.g_u_i.quit_request:
-                    return
+                if job.quit_request:
+                    return None
 
                 if isinstance(element, svgelements.Line)\
                     or isinstance(element, svgelements.QuadraticBezier)\
                         or isinstance(element, svgelements.CubicBezier):
                     # get a list of points that make a curve
-                    d = element.length()/((maxx-minn)/650)
+                    d = element.length()/((maxx-minn)/board)
                     for inter in range(int(d)):
                         points.append(element.point(inter / int(d)))
 
@@ -130,14 +177,15 @@ class FileManager:
 
         # resize drawing to fit board
         def convx(x):
-            return ((325 - (-325)) / (maxx - minn)) * (x - minn) - 325
+            return (board / (maxx - minn)) * (x - minn) - board / 2
 
         def convy(x):
-            return ((325 - (-325)) / (maxx - minn)) * (x - minn) - 325
+            return (board / (maxx - minn)) * (x - minn) - board / 2
 
-        ratio = (maxx-minn)/650
+        ratio = (maxx-minn)/board
 
-        # draw the paths using manual object
+        # points of the paths with their font
+        point_list = []
         for path_i in paths:
 
             # get font color
@@ -148,18 +196,14 @@ class FileManager:
                 s = 0 if v == 0 else 2 * (1 - l / v)
                 return h, s, v
 
-            h1, s1, v1 = hsl_to_hsv(path_i.fill.hsl)
+            font = self._manual.rgb_font(hsl_to_hsv(path_i.fill.hsl))
 
-            self._manual.set_hue(h1)
-            self._manual.set_sat(s1)
-            self._manual.set_val(v1)
-
-            # draw each element of the path
+            # add each element of the path
             for element in path_i:
 
                 # stop importing if requested
-                if self._layer.g_u_i.quit_request:
-                    return
+                if job.quit_request:
+                    return None
 
                 els = []
 
@@ -171,33 +215,172 @@ class FileManager:
 
                 # add generated points to manual drawing list
                 for el in els:
-                    self._manual.increment((convx(el.real) + 1j * -convy(el.imag)))
+                    point_list.append(
+                        (convx(el.real) + 1j * -convy(el.imag), font))
+
+        return point_list
+
+    def set_drawing(self, point_list):
+        """replaces the manual drawing by imported points,
+        in the UI thread"""
 
+        self._manual.set_point_list(point_list)
         self._animation.update_time()
         self._animation.no_render()
 
-        self._importing = False
-
     def exporting(self):
         """launch exporting"""
 
-        if not self._exporting and self._animation.is_rendered()\
-                and not self._layer.animation.asking() and not self._importing:
+        if not self.is_exporting() and self._animation.is_rendered()\
+                and not self._layer.animation.asking()\
+                and not self._asking and not self.is_importing():
 
-            self._exporting = True
             self.enable_exporting(False)
             self._manual.enable_clearing(False)
             self._animation.enable_speed(False)
-            threading.Thread(target=self.exp).start()
+            self._export_job = self._layer.jobs.submit(
+                "export", self.exp, on_progress=self.show_progress,
+                on_end=self._export_ended)
 
-    def exp(self):
-        """Exports animation into mp4 format"""
+    def exp(self, job):
+        """Exports animation into a video, gif or png sequence
+        in the thread of its job
 
-        # Create temp directory if it does not exist
-        if not os.path.exists("temp"):
-            os.makedirs("temp")
+        returns False if no file was written
 
-        # Create temp directory if it does not exist
+        """
+
+        file_path = self.ask_video_path()
+        if file_path is None:
+            return False
+
+        return self.write_video(job, [file_path])
+
+    def segment_exporting(self):
+        """launch exporting by segments encoded in parallel"""
+
+        if not self.is_exporting() and self._animation.is_rendered()\
+                and not self._layer.animation.asking()\
+                and not self._asking and not self.is_importing():
+
+            self.enable_exporting(False)
+            self._manual.enable_clearing(False)
+            self._animation.enable_speed(False)
+            self._export_job = self._layer.jobs.submit(
+                "export", self.seg_exp, on_progress=self.show_progress,
+                on_end=self._export_ended)
+
+    def seg_exp(self, job):
+        """Exports animation into a video or png sequence by segments
+        encoded in parallel, in the thread of its job
+
+        returns False if no file was written
+
+        """
+
+        file_path = self.ask_video_path(SEGMENT_FILE_TYPES)
+        if file_path is None:
+            return False
+
+        # joining video segments needs ffmpeg
+        if s_g.needs_join(file_path) and not s_g.can_join():
+            root = tk.Tk()
+            root.withdraw()
+            messagebox.showinfo(
+                "Exporting", "ffmpeg was not found to join video segments:"
+                             " the video is encoded without segments.")
+            root.destroy()
+            return self.write_video(job, [file_path])
+
+        # resume an interrupted export of the same animation
+        resume = False
+        if s_g.load_checkpoint([file_path],
+                               self.export_parameters()) is not None:
+            root = tk.Tk()
+            root.withdraw()
+            resume = messagebox.askyesno(
+                "Resume", "An export of this animation into this file "
+                          "was interrupted. Resume it?")
+            root.destroy()
+
+        return self.write_video(job, [file_path], segmented=True,
+                                resume=resume)
+
+    def render_exporting(self):
+        """launch rendering straight into a video file"""
+
+        if not self.is_exporting() and not self.is_importing()\
+                and not self._layer.animation.asking()\
+                and not self._asking\
+                and not self._animation.is_rendering()\
+                and len(self._manual.point_list()) > 1:
+
+            # forget any previous animation
+            self._animation.no_render()
+
+            self.enable_exporting(False)
+            self.enable_importing(False)
+            self._manual.enable_clearing(False)
+            self._animation.enable_rendering(False)
+            self._animation.enable_speed(False)
+            self._export_job = self._layer.jobs.submit(
+                "export", self.ren_exp, on_progress=self.show_progress,
+                on_end=self._export_ended)
+
+    def ren_exp(self, job):
+        """Renders the animation straight into a video, gif
+        or png sequence in the thread of its job
+
+        returns False if no file was written
+
+        """
+
+        file_path = self.ask_video_path()
+        if file_path is None:
+            return False
+
+        return self.render_video(job, [file_path])
+
+    def show_progress(self, event):
+        """displays the progress of an export job"""
+
+        if event.stage == "export":
+            text = str(event.percent) + "%"
+            if event.detail is not None:
+                text += " " + event.detail
+            self._layer.layer_objects["label export%"].text = text
+        else:
+            self._animation.show_progress(event)
+
+    def _export_ended(self, event):
+        """enables the actions disabled by exporting,
+        once the export job ended"""
+
+        self._export_job = None
+
+        if isinstance(event, jobs.Failed):
+            if isinstance(event.error, RuntimeError):
+                self.show_error('Exporting error', event.error)
+            else:
+                jobs.print_error(event)
+
+        # results of the clocks rendered straight into the file
+        if not self._animation.is_rendered():
+            self._animation.display_render_results()
+
+        self.enable_exporting(self._animation.is_rendered())
+        self._animation.enable_rendering(
+            not self._animation.is_rendered()
+            and len(self._manual.point_list()) > 1)
+        self.enable_importing(True)
+        self._animation.enable_speed(True)
+        self._manual.enable_clearing(True)
+
+    def ask_video_path(self, file_types=EXPORT_FILE_TYPES):
+        """asks the user for the file to export to,
+        returns None if no file was chosen"""
+
+        # Create renders directory if it does not exist
         if not os.path.exists("renders"):
             os.makedirs("renders")
 
@@ -205,93 +388,283 @@ class FileManager:
         root = tk.Tk()
         root.withdraw()
         file_path = filedialog.asksaveasfilename(
-            defaultextension='.mp4', filetypes=[("mp4", '*.mp4')],
+            defaultextension='.mp4', filetypes=file_types,
             initialdir="renders", initialfile='render.mp4',
             title="Choose filename")
         root.destroy()
 
         if file_path is None or file_path == "":
-            self._exporting = False
-            self.enable_exporting(True)
-            self._manual.enable_clearing(True)
-            self._animation.enable_speed(True)
-            return
-
-        frames = self._animation.frames()
-
-        # generate temporary image files
-        for i, frame in enumerate(frames):
-
-            # stop exporting if requested
-            if self._layer.g_u_i.quit_request:
-                for filename in os.listdir("temp"):
-                    file_path = os.path.join("temp", filename)
-                    os.remove(file_path)
-                return
-
-            surf = pygame.Surface((self._layer.size[1], self._layer.size[1]))
-            surf.fill(WHITE)
-            surf.blit(frame, (0, 0))
-            pygame.image.save(surf, os.path.join("temp", f"temp{i}.jpeg"))
-
-            # display export percentage progress
-            percent = str(int(50 * i / len(frames))) + "%"
-            self._layer.layer_objects["label export%"].text = percent
-
-        # Determine the width and height from the first image
-        frame = cv2.imread(os.path.join("temp", "temp0.jpeg"))
-        height, width, _ = frame.shape
-
-        # Define the codec and create VideoWriter object
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')  # Be sure to use lower case
-        out = cv2.VideoWriter(file_path, fourcc, 20.0, (width, height))
-
-        # write the frames to the video file
-        for i in range(len(frames)):
-
-            # stop exporting if requested
-            if self._layer.g_u_i.quit_request:
-                out.release()
-                # delete mp4 and temp images
-                os.remove(file_path)
-                for filename in os.listdir("temp"):
-                    file_path = os.path.join("temp", filename)
-                    os.remove(file_path)
-                return
-
-            frame = cv2.imread(os.path.join("temp", f"temp{i}.jpeg"))
-
-            # Write out frame to video
-            out.write(frame)
-
-            # display export percentage progress
-            percent = str(int(50+50 * i / len(frames))) + "%"
-            self._layer.layer_objects["label export%"].text = percent
-
-        self._layer.layer_objects["label export%"].text = "100%"
-
-        # Release everything if job is finished
-        out.release()
-
-        # empty the temp folder
-        for filename in os.listdir("temp"):
-            file_path = os.path.join("temp", filename)
-            os.remove(file_path)
-
-        self._exporting = False
-        self.enable_exporting(True)
-        self._animation.enable_speed(True)
-        self._manual.enable_clearing(True)
+            return None
+        return file_path
 
-    def is_exporting(self):
+    def show_error(self, title, error):
+        """shows an error in a message box from a new thread"""
+
+        def show():
+            root = tk.Tk()
+            root.withdraw()
+            messagebox.showerror(title, str(error))
+            root.destroy()
+
+        threading.Thread(target=show).start()
+
+    def write_video(self, job, file_paths, segmented=False, resume=False):
+        """Writes the animation frames into one or several files,
+        streaming them to the encoders without temporary images,
+        or by segments encoded in parallel
+
+        returns False if exporting was stopped,
+        raises RuntimeError if the video cannot be encoded
+
+        """
+
+        if self.is_resampled() or segmented:
+            return self.stream_scene(job, file_paths,
+                                     self._animation.scene(), segmented,
+                                     resume)
+
+        return self.stream_video(job, file_paths,
+                                 self._animation.iter_frames(),
+                                 self._animation.frame_count(),
+                                 colors=self._animation.scene().colors())
+
+    def render_video(self, job, file_paths, segmented=False, resume=False):
+        """Renders the animation straight into one or several files.
+
+        Only the clocks are computed beforehand: frames are drawn
+        (by the rasterization pool for long animations) while the
+        encoder writes the previous ones, and none of them is kept,
+        so memory is bounded by the encoder queue whatever the
+        length of the animation.
+
+        returns False if exporting was stopped,
+        raises RuntimeError if the video cannot be encoded
+
+        """
+
+        scene = self._animation.render_scene(job)
+        if scene is None:
+            return False
+
+        return self.stream_scene(job, file_paths, scene, segmented, resume)
+
+    def stream_scene(self, job, file_paths, scene, segmented=False,
+                     resume=False):
+        """Draws the frames of a scene at the export size (by the
+        rasterization pool for long animations) while streaming
+        them into one or several files
+
+        segmented exports split the frames into segments,
+        each drawn and encoded by a worker process, and keep the
+        finished ones with a checkpoint until the files are written,
+        so that an interrupted export can be resumed
+
+        returns False if exporting was stopped,
+        raises RuntimeError if a file cannot be exported
+
+        """
+
+        side = self.export_side()
+        if self.is_resampled():
+            scene = s_s.Supersampler(scene, side, self._supersample)
+
+        if segmented:
+            job.set_stage("export")
+            return s_g.encode_segments(scene, file_paths, job,
+                                       self._animation.raster_workers(),
+                                       self.export_parameters(), resume,
+                                       self.hold_frames(),
+                                       self._hold_tolerance)
+
+        frames = f_r.iter_parallel_frames(scene, job,
+                                          self._animation.raster_workers())
+        return self.stream_video(job, file_paths, frames, scene.frame_count(),
+                                 side, scene.colors())
+
+    def stream_video(self, job, file_paths, frames, frame_count, side=None,
+                     colors=None):
+        """Streams frames into one or several files, each through
+        the bounded queue of its own stream, converting every frame
+        once for all of them
+
+        the format of each file is given by its extension,
+        frames are squares of the given side (the board by default)
+        drawn with the given colors, which gif palettes are built from
+
+        returns False if exporting was stopped,
+        raises RuntimeError if a file cannot be exported
+
+        """
+
+        job.set_stage("export")
+        if side is None:
+            side = self._layer.size[1]
+        streams = []
+        try:
+            for file_path in file_paths:
+                streams.append(v_d.open_stream(file_path, (side, side),
+                                               colors=colors))
+        except RuntimeError:
+            for stream in streams:
+                stream.abort()
+            raise
+
+        # every frame is drawn on the same white background
+        surf = pygame.Surface((side, side))
+        runs = v_d.RunWriter(streams, self._hold_tolerance)
+
+        try:
+            for i, frame in enumerate(frames):
+
+                # stop exporting if requested
+                if job.quit_request:
+                    for stream in streams:
+                        stream.abort()
+                    return False
+
+                surf.fill(WHITE)
+                surf.blit(frame, (0, 0))
+                runs.write(surf)
+
+                # report export percentage progress of the slowest file
+                encoded = min(stream.encoded() for stream in streams)
+                job.progress(100 * encoded / frame_count)
+
+            # hold the final drawing
+            runs.finish(self.hold_frames())
+            for stream in streams:
+                stream.close()
+        except RuntimeError:
+            for stream in streams:
+                stream.abort()
+            raise
+
+        job.progress(100)
+
+        return True
+
+    def resolution(self):
+        """launches res"""
+
+        if not self._asking and not self.is_exporting()\
+                and not self._layer.animation.asking():
+
+            self._asking = True
+            self.enable_exporting(False)
+            threading.Thread(target=self.res).start()
+
+    def res(self):
+        """asks the user for the side of exported frames, their
+        supersampling factor, how long the final drawing is held
+        and how different frames held as the previous one can be"""
+
+        root = tk.Tk()
+        root.withdraw()
+        side = simpledialog.askinteger(
+            "Input", "Side of exported videos? (pixels, 0 for the board)",
+            minvalue=0, initialvalue=self._export_side or 0)
+        factor = None
+        if side is not None:
+            factor = simpledialog.askinteger(
+                "Input", "Supersampling? (1 for none, 2 or 4 to smooth "
+                         "lines)", minvalue=1, maxvalue=8,
+                initialvalue=self._supersample)
+        hold = None
+        if factor is not None:
+            hold = simpledialog.askfloat(
+                "Input", "Hold the final drawing for how many seconds?",
+                minvalue=0, initialvalue=self._hold)
+        tolerance = None
+        if hold is not None:
+            tolerance = simpledialog.askinteger(
+                "Input", "Hold frames differing from the previous one by "
+                         "at most? (0 to 255 per color channel, 0 for "
+                         "identical frames only)", minvalue=0, maxvalue=255,
+                initialvalue=self._hold_tolerance)
+        root.destroy()
+
+        if tolerance is not None:
+            self.set_export_size(side, factor)
+            self.set_hold(hold, tolerance)
+
+        self.enable_exporting(self._animation.is_rendered())
+        self._asking = False
+
+    def set_export_size(self, side, supersample=1):
+        """sets the side of exported frames (None or 0 for the board)
+        and their supersampling factor"""
+
+        self._export_side = side or None
+        self._supersample = max(1, int(supersample))
+
+    def set_hold(self, seconds, tolerance=v_d.HOLD_TOLERANCE):
+        """sets the seconds the final drawing is held for and the
+        largest channel difference of frames held as the previous one"""
+
+        self._hold = max(0, seconds or 0)
+        self._hold_tolerance = min(255, max(0, int(tolerance)))
+
+    def hold(self):
         """getter"""
 
-        return self._exporting
+        return self._hold
 
-    def is_importing(self):
+    def hold_frames(self):
+        """returns the frames the final drawing is held for"""
+
+        return round(self._hold * v_d.FRAME_RATE)
+
+    def hold_tolerance(self):
         """getter"""
 
-        return self._importing
+        return self._hold_tolerance
+
+    def export_parameters(self):
+        """returns everything the exported frames depend on"""
+
+        parameters = self._animation.render_parameters()
+        parameters["side"] = self.export_side()
+        parameters["supersample"] = self._supersample
+        parameters["hold"] = self.hold_frames()
+        parameters["hold_tolerance"] = self._hold_tolerance
+
+        return parameters
+
+    def export_side(self):
+        """returns the side of exported frames"""
+
+        if self._export_side is None:
+            return self._layer.size[1]
+        return self._export_side
+
+    def is_resampled(self):
+        """checks if exported frames are drawn again from the clocks
+        at another size or supersampled"""
+
+        return self.export_side() != self._layer.size[1] \
+            or self._supersample > 1
+
+    def asking(self):
+        """getter"""
+
+        return self._asking
+
+    def is_exporting(self):
+        """checks if an export job is running"""
+
+        return self._export_job is not None
+
+    def is_importing(self):
+        """checks if an import job is running"""
+
+        return self._import_job is not None
+
+    def cancel(self):
+        """stops the current import and export"""
+
+        for job in (self._import_job, self._export_job):
+            if job is not None:
+                job.cancel()
 
     def enable_exporting(self, value):
         """enables or disable exporting"""
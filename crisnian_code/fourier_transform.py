@@ -0,0 +1,489 @@
+import math
+import os
+import concurrent.futures
+from multiprocessing import shared_memory
+import numpy as np
+from crisnian_code import layer_utilities as l_u
+
+# number of points/coefficients handled between two
+# progress updates and cancellation checks
+CHUNK_SIZE = 8192
+
+# the process pool backend falls back to the numpy backend
+# under this number of points
+POOL_THRESHOLD = 200000
+POOL_WORKERS = os.cpu_count() or 1
+
+# complex types of the numpy computations
+PRECISIONS = {
+    "double": np.complex128,
+    "single": np.complex64,
+}
+DEFAULT_PRECISION = "double"
+
+
+def numpy_fourier_transform(sequence, job, percent_split,
+                            precision=DEFAULT_PRECISION):
+    """Computes Discrete Fourier coefficients
+    for the points of the manual or loaded drawing
+    with NumPy's FFT
+
+    gives the same coefficients in the same order as
+    the reference discrete_fourier_transform, for any N
+    (non power-of-two lengths go through Bluestein's algorithm),
+    computed in single or double precision
+
+    returns the coefficients as an array of the precision,
+    or None if the transform was stopped
+
+    """
+
+    dtype = PRECISIONS[precision]
+
+    # number of points
+    N = len(sequence)
+    if N == 0:
+        return np.empty(0, dtype=dtype)
+
+    # convert the sequence to an array chunk by chunk
+    points = np.empty(N, dtype=dtype)
+    for start in range(0, N, CHUNK_SIZE):
+
+        # stop if requested
+        if job.quit_request:
+            return None
+
+        end = min(start + CHUNK_SIZE, N)
+        points[start:end] = sequence[start:end]
+
+        # display percentage progress
+        job.progress(int(percent_split * end / (2 * N)))
+
+    # xn = 1/N * sum[k=0->k=N-1](Xk*exp(2*i*pi*k*n/N))
+    coefficients = np.fft.ifft(points).astype(dtype, copy=False)
+    job.progress(int(percent_split))
+
+    return coefficients
+
+
+def _pool_split(N, workers):
+    """returns the largest divisor of N not above the number of workers"""
+
+    for P in range(min(workers, N), 0, -1):
+        if N % P == 0:
+            return P
+
+    return 1
+
+
+def _pool_subsequence_transform(names, N, P, p):
+    """pool step 1: transform of the p-th interleaved subsequence
+    Yp[k] = sum[j=0->j=M-1](X(P*j+p)*exp(2*i*pi*j*k/M))"""
+
+    points_memory = shared_memory.SharedMemory(name=names[0])
+    partial_memory = shared_memory.SharedMemory(name=names[1])
+    try:
+        M = N // P
+        points = np.ndarray((N,), np.complex128, points_memory.buf)
+        partial = np.ndarray((P, M), np.complex128, partial_memory.buf)
+        partial[p] = np.fft.ifft(points[p::P]) * M
+        del points, partial
+    finally:
+        points_memory.close()
+        partial_memory.close()
+
+
+def _pool_combine(names, N, P, start, end):
+    """pool step 2: combination of the subsequence transforms
+    for coefficients start to end
+    xn = 1/N * sum[p=0->p=P-1](exp(2*i*pi*p*n/N)*Yp[n mod M])"""
+
+    partial_memory = shared_memory.SharedMemory(name=names[1])
+    coefficients_memory = shared_memory.SharedMemory(name=names[2])
+    try:
+        M = N // P
+        partial = np.ndarray((P, M), np.complex128, partial_memory.buf)
+        coefficients = np.ndarray((N,), np.complex128,
+                                  coefficients_memory.buf)
+        n = np.arange(start, end)
+        total = np.zeros(end - start, dtype=np.complex128)
+        for p in range(P):
+            total += np.exp(2j * np.pi * p * n / N) * partial[p, n % M]
+        coefficients[start:end] = total / N
+        del partial, coefficients
+    finally:
+        partial_memory.close()
+        coefficients_memory.close()
+
+
+def _pool_run(executor, tasks, job, start_percent, end_percent):
+    """Runs tasks in the pool and waits for them, displaying progress.
+
+    returns False if the tasks were cancelled by a quit request
+
+    """
+
+    futures = [executor.submit(*task) for task in tasks]
+    pending = set(futures)
+    while pending:
+
+        # stop if requested
+        if job.quit_request:
+            for future in pending:
+                future.cancel()
+            return False
+
+        done, pending = concurrent.futures.wait(
+            pending, timeout=0.1,
+            return_when=concurrent.futures.FIRST_COMPLETED)
+
+        # raise worker errors
+        for future in done:
+            future.result()
+
+        # display percentage progress
+        finished = len(futures) - len(pending)
+        percent = start_percent + \
+            (end_percent - start_percent) * finished / len(futures)
+        job.progress(int(percent))
+
+    return True
+
+
+def process_pool_fourier_transform(sequence, job, percent_split,
+                                   precision=DEFAULT_PRECISION):
+    """Computes Discrete Fourier coefficients
+    for the points of the manual or loaded drawing
+    in a pool of worker processes
+
+    the points are split into P interleaved subsequences
+    (P being the largest divisor of N up to the number of workers)
+    whose FFTs are computed in parallel then combined
+    over ranges of coefficients, with all arrays in shared memory
+
+    falls back to the numpy backend for small drawings
+    or when N has no useful divisor
+
+    the pool always computes in double precision, single precision
+    coefficients are rounded from its result
+
+    returns the coefficients as an array of the precision,
+    or None if the transform was stopped
+
+    """
+
+    N = len(sequence)
+    P = _pool_split(N, POOL_WORKERS)
+    if N < POOL_THRESHOLD or P == 1:
+        return numpy_fourier_transform(sequence, job, percent_split,
+                                       precision)
+
+    size = N * np.dtype(np.complex128).itemsize
+    memories = [shared_memory.SharedMemory(create=True, size=size)
+                for _ in range(3)]
+    names = [memory.name for memory in memories]
+    executor = concurrent.futures.ProcessPoolExecutor(P)
+    try:
+        points = np.ndarray((N,), np.complex128, memories[0].buf)
+        points[:] = sequence
+        del points
+
+        # transform interleaved subsequences
+        tasks = [(_pool_subsequence_transform, names, N, P, p)
+                 for p in range(P)]
+        if not _pool_run(executor, tasks, job, 0, percent_split / 2):
+            return None
+
+        # combine them over ranges of coefficients
+        bounds = list(range(0, N, max(CHUNK_SIZE, -(-N // (4 * P))))) + [N]
+        tasks = [(_pool_combine, names, N, P, start, end)
+                 for start, end in zip(bounds[:-1], bounds[1:])]
+        if not _pool_run(executor, tasks, job, percent_split / 2,
+                         percent_split):
+            return None
+
+        # copy the coefficients out of shared memory
+        shared = np.ndarray((N,), np.complex128, memories[2].buf)
+        coefficients = shared.astype(PRECISIONS[precision])
+        del shared
+    finally:
+        executor.shutdown(wait=not job.quit_request, cancel_futures=True)
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+    return coefficients
+
+
+def reference_fourier_transform(sequence, job, percent_split,
+                                precision=DEFAULT_PRECISION):
+    """Computes Discrete Fourier coefficients
+    with the pure-Python discrete_fourier_transform
+
+    Python complex numbers are always in double precision
+
+    returns the coefficients as an array,
+    or None if the transform was stopped
+
+    """
+
+    fourier_coefficients = []
+    l_u.discrete_fourier_transform(sequence, fourier_coefficients, job,
+                                   percent_split)
+    if job.quit_request:
+        return None
+
+    return np.array(fourier_coefficients, dtype=np.complex128)
+
+
+# available transform backends
+BACKENDS = {
+    "numpy": numpy_fourier_transform,
+    "process_pool": process_pool_fourier_transform,
+    "reference": reference_fourier_transform,
+}
+DEFAULT_BACKEND = "numpy"
+
+
+def fourier_transform(sequence, job, percent_split,
+                      backend=DEFAULT_BACKEND, precision=DEFAULT_PRECISION):
+    """returns the Fourier coefficients of a sequence as an array,
+    computed with the chosen backend and precision
+
+    the transform stops early on the quit request of its job,
+    returning None, and reports its progress up to percent_split to it
+
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError("unknown Fourier backend: " + str(backend))
+    if precision not in PRECISIONS:
+        raise ValueError("unknown precision: " + str(precision))
+
+    return BACKENDS[backend](sequence, job, percent_split, precision)
+
+
+class _Progress:
+    """maps the progress of one transform to a part
+    of the total progress of a job"""
+
+    def __init__(self, job, start, scale):
+        self._job = job
+        self._start = start
+        self._scale = scale
+
+    @property
+    def quit_request(self):
+        """checks if the job must stop"""
+
+        return self._job.quit_request
+
+    def progress(self, percent):
+        """reports the progress of the transform"""
+
+        self._job.progress(int(self._start + self._scale * percent / 100))
+
+
+def stroke_bounds(breaks):
+    """returns the start and end of every stroke"""
+
+    starts = np.flatnonzero(breaks)
+    ends = np.append(starts[1:], len(breaks))
+
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def stroke_fourier_transform(sequence, breaks, job, percent_split,
+                             backend=DEFAULT_BACKEND,
+                             precision=DEFAULT_PRECISION):
+    """Computes Discrete Fourier coefficients
+    for every stroke of the drawing separately
+
+    each stroke is followed by its reverse so that it forms
+    a closed path without jumps, which needs far fewer harmonics
+    than the jumps between strokes of the whole drawing
+
+    returns the coefficients of all strokes concatenated, a stroke
+    of n points taking 2n coefficients, or None if the transform
+    was stopped
+
+    """
+
+    sequence = np.asarray(sequence, dtype=np.complex128)
+    N = len(sequence)
+
+    fourier_coefficients = []
+    for start, end in stroke_bounds(breaks):
+
+        # stop if requested
+        if job.quit_request:
+            return None
+
+        stroke = sequence[start:end]
+        stroke = np.concatenate((stroke, stroke[::-1]))
+
+        progress = _Progress(job, percent_split * start / N,
+                             percent_split * (end - start) / N)
+        stroke_coefficients = fourier_transform(stroke, progress, 100,
+                                                backend, precision)
+        if stroke_coefficients is None:
+            return None
+        fourier_coefficients.append(stroke_coefficients)
+
+    if not fourier_coefficients:
+        return np.empty(0, dtype=PRECISIONS[precision])
+
+    return np.concatenate(fourier_coefficients)
+
+
+def double_precision_coefficients(sequence, breaks=None):
+    """returns the double precision Fourier coefficients of a sequence,
+    or of each of its strokes laid out as by stroke_fourier_transform
+    if stroke breaks are given"""
+
+    sequence = np.asarray(sequence, dtype=np.complex128)
+    if breaks is None:
+        return np.fft.ifft(sequence)
+
+    strokes = [sequence[start:end] for start, end in stroke_bounds(breaks)]
+
+    return np.concatenate([np.fft.ifft(np.concatenate((s, s[::-1])))
+                           for s in strokes])
+
+
+class LiveTransform:
+    """keeps the drawing points as an array that is updated
+    as points are added or removed, along with the last computed
+    Fourier coefficients (as an array) so that they are only
+    recomputed when the drawing has changed since the last
+    transform"""
+
+    def __init__(self):
+        self._points = np.empty(1024, dtype=np.complex128)
+        self._length = 0
+        self._coefficients = None  # coefficients of the current points
+        self._backend = None  # backend and precision of the coefficients
+
+    def append(self, point):
+        """adds a point at the end of the drawing"""
+
+        self.extend((point,))
+
+    def extend(self, points):
+        """adds points at the end of the drawing"""
+
+        new_length = self._length + len(points)
+
+        # grow the buffer geometrically
+        if new_length > len(self._points):
+            buffer = np.empty(max(new_length, 2 * len(self._points)),
+                              dtype=np.complex128)
+            buffer[:self._length] = self._points[:self._length]
+            self._points = buffer
+
+        self._points[self._length:new_length] = points
+        self._length = new_length
+        self._coefficients = None
+
+    def reset(self, points=()):
+        """replaces all the points of the drawing"""
+
+        self._length = 0
+        self._coefficients = None
+        self.extend(points)
+
+    def points(self):
+        """getter"""
+
+        return self._points[:self._length]
+
+    def is_dirty(self, backend=DEFAULT_BACKEND, precision=DEFAULT_PRECISION):
+        """checks if the coefficients must be recomputed"""
+
+        return self._coefficients is None \
+            or self._backend != (backend, precision)
+
+    def set_coefficients(self, coefficients, backend=DEFAULT_BACKEND,
+                         precision=DEFAULT_PRECISION):
+        """sets already known coefficients of the current points"""
+
+        if len(coefficients) == self._length:
+            self._coefficients = np.asarray(coefficients,
+                                            dtype=PRECISIONS[precision])
+            self._backend = backend, precision
+
+    def transform(self, job, percent_split, backend=DEFAULT_BACKEND,
+                  precision=DEFAULT_PRECISION):
+        """returns the Fourier coefficients of the current points,
+        only running the transform if the points changed,
+        or None if the transform was stopped"""
+
+        # reuse coefficients if the drawing did not change
+        if not self.is_dirty(backend, precision):
+            job.progress(int(percent_split))
+            return self._coefficients
+
+        coefficients = fourier_transform(self.points(), job, percent_split,
+                                         backend, precision)
+
+        # only keep complete transforms
+        if coefficients is not None:
+            self._coefficients = coefficients
+            self._backend = backend, precision
+
+        return coefficients
+
+
+def spectral_energy(coefficients):
+    """returns the energy of a set of Fourier coefficients,
+    which is the mean squared modulus of the points
+    they reconstruct (Parseval)"""
+
+    return float(np.sum(np.abs(np.asarray(coefficients,
+                                          dtype=np.complex128)) ** 2))
+
+
+def select_harmonics(coefficients, harmonics=None, energy_fraction=None):
+    """Returns the indices of the coefficients to draw.
+
+    Without limits, every coefficient is kept in frequency order.
+    Otherwise, the constant term is always kept and the other
+    coefficients are kept by decreasing modulus until either
+    the number of harmonics or the fraction of the spectral
+    energy (without the constant term) is reached.
+
+    """
+
+    N = len(coefficients)
+
+    # keep every coefficient in frequency order
+    if harmonics is None and energy_fraction is None:
+        return list(range(int(N / 2), N)) + list(range(int(N / 2)))
+
+    # sort non-constant coefficients by decreasing energy,
+    # in double precision whatever the coefficients
+    energies = np.abs(np.asarray(coefficients, dtype=np.complex128)) ** 2
+    order = np.argsort(-energies[1:], kind="stable") + 1
+
+    # number of harmonics set directly
+    K = len(order)
+    if harmonics is not None:
+        K = min(K, max(0, int(harmonics)))
+
+    # number of harmonics needed to keep the energy fraction
+    if energy_fraction is not None and len(order) > 0:
+        cumulative = np.cumsum(energies[order])
+        target = min(1, max(0, energy_fraction)) * cumulative[-1]
+        K = min(K, int(np.searchsorted(cumulative, target)) + 1)
+
+    return [0] + order[:K].tolist()
+
+
+def truncation_error(coefficients, indices):
+    """returns the RMS distance in pixels between the drawing
+    and its reconstruction from the selected coefficients (Parseval)"""
+
+    total = spectral_energy(coefficients)
+    kept = spectral_energy([coefficients[i] for i in indices])
+
+    return math.sqrt(max(0.0, total - kept))
@@ -0,0 +1,65 @@
+import numpy as np
+
+# pixels of tip movement a radian of turning is worth
+CURVATURE_WEIGHT = 10
+
+# steps shorter than this (in pixels) do not count for turning,
+# their direction being mostly rounding noise
+MIN_STEP = 0.5
+
+
+def motion_cost(tips, breaks):
+    """Returns the cost of reaching every drawing point from the
+    previous one: the distance moved by the drawing tip plus the
+    weighted angle it turned by.
+
+    jumps between strokes cost nothing
+
+    """
+
+    tips = np.asarray(tips, dtype=np.float64)
+    cost = np.zeros(len(tips))
+    if len(tips) < 2:
+        return cost
+
+    steps = np.diff(tips, axis=0)
+    lengths = np.hypot(steps[:, 0], steps[:, 1])
+    connected = ~np.asarray(breaks[1:], dtype=bool)
+    cost[1:] = np.where(connected, lengths, 0)
+
+    # angle turned between two connected steps
+    angles = np.arctan2(steps[:, 1], steps[:, 0])
+    turns = np.abs(np.angle(np.exp(1j * np.diff(angles))))
+    counted = connected[1:] & connected[:-1] \
+        & (lengths[1:] >= MIN_STEP) & (lengths[:-1] >= MIN_STEP)
+    cost[2:] += CURVATURE_WEIGHT * np.where(counted, turns, 0)
+
+    return cost
+
+
+def adaptive_frame_points(tips, breaks, budget):
+    """Chooses at most budget drawing points that start a frame,
+    spread evenly along the motion cost of the drawing tip, so that
+    frames are dense where the tip moves fast or turns sharply and
+    sparse on slow straight runs.
+
+    tips are the board positions of the tip at every drawing point,
+    the first drawing point always starts a frame
+
+    """
+
+    count = len(tips)
+    budget = max(1, min(int(budget), count))
+
+    cumulative = np.cumsum(motion_cost(tips, breaks))
+    total = cumulative[-1] if count > 0 else 0
+
+    # a static tip gets evenly spaced frames
+    if total <= 0:
+        points = np.linspace(0, count, budget, endpoint=False)
+        return np.unique(points.astype(int)).tolist()
+
+    targets = np.linspace(0, total, budget, endpoint=False)
+    points = np.searchsorted(cumulative, targets, side="left")
+
+    return np.unique(points).tolist()
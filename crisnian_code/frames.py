@@ -0,0 +1,607 @@
+import bisect
+import copy
+import math
+import os
+import threading
+import concurrent.futures
+import numpy as np
+import pygame
+from pygui import colors as col
+from crisnian_code import layer_utilities as l_u
+from crisnian_code import epicycles as e_c
+from crisnian_code import sprites as s_p
+
+BLACK = col.BLACK
+RED = col.RED
+GREEN = col.GREEN
+
+# number of frames drawn ahead of lazy playback
+LOOKAHEAD = 8
+
+# stored frames are drawn by a pool of worker processes
+# from this number of frames, in shards of consecutive frames
+RASTER_THRESHOLD = 256
+RASTER_WORKERS = os.cpu_count() or 1
+SHARDS_PER_WORKER = 4
+
+# largest pixel buffers of a shard, so that large frames
+# are split into more shards
+SHARD_BYTES = 64 << 20
+
+# ways of keeping the frames of a rendered animation
+FRAME_MODES = (
+    "stored",  # every frame surface is kept in memory
+    "compact",  # frames are kept as descriptors drawn when shown
+    "lazy",  # frames are drawn on demand by a background thread
+)
+
+
+class ClockScene:
+    """Stores everything needed to draw any frame
+    of a clock drawing animation.
+
+    The drawing is made of segments that are separately
+    transformed, given as (first point, number of points,
+    coefficients, kept coefficient indices). A frame starts at
+    every animation speed-th drawing point, or at the given
+    drawing points, and a last frame shows only the final drawing.
+
+    Clocks smaller than the culling threshold (in pixels) are not
+    drawn: their sum is drawn as a single last arrow ending
+    at the drawing tip, so the clock drawing stays exact.
+
+    A scene can be scaled to draw its frames on a larger
+    or smaller board, for exporting at any resolution.
+
+    """
+
+    def __init__(self, size, tips, breaks, fonts, segments, speed, dtype,
+                 cull=0, frame_points=None):
+        self._size = size
+        self._tips = tips  # board position of the tip at every point
+        self._breaks = breaks  # stroke start of every point
+        self._fonts = fonts
+        self._segments = segments
+        self._dtype = dtype
+
+        # drawing points that start a frame and their segment
+        self._frame_points = []
+        self._frame_segments = []
+        if frame_points is None:
+            for number, (start, count, coefficients, kept) \
+                    in enumerate(segments):
+                first = -start % speed
+                points = range(start + first, start + count, speed)
+                self._frame_points.extend(points)
+                self._frame_segments.extend([number] * len(points))
+        else:
+            starts = [segment[0] for segment in segments]
+            self._frame_points = list(frame_points)
+            self._frame_segments = [bisect.bisect_right(starts, point) - 1
+                                    for point in frame_points]
+
+        # drawn clocks, whether the other clocks are drawn as a last
+        # arrow, size of clocks and whether they are drawn with an arrow
+        self._drawn = []
+        self._tails = []
+        self._clock_sizes = []
+        self._arrows = []
+        for start, count, coefficients, kept in segments:
+
+            # sizes in double precision whatever the coefficient array
+            values = dict(zip(kept, np.asarray(coefficients)[kept].tolist()))
+            drawn = [n for n in kept if l_u.c_mod(values[n]) >= cull]
+            self._drawn.append(drawn)
+            self._tails.append(len(drawn) < len(kept))
+            self._clock_sizes.append([l_u.c_mod(values[n]) for n in drawn])
+            self._arrows.append([values[n] != 0 for n in drawn])
+
+        # whether clocks are blitted from sprites,
+        # and the sprites of every drawing thread
+        self._small = [[size < s_p.SPRITE_MAX_RADIUS for size in sizes]
+                       for sizes in self._clock_sizes]
+        self._sprites = {}
+
+        # board pixels per screen pixel
+        self._scale = 1
+
+    def scaled(self, side):
+        """returns a copy of the scene drawing its frames on a square
+        board of the given side, every length being scaled"""
+
+        scale = side / self._size[1]
+        scene = copy.copy(self)
+        scene._size = side, side
+        scene._scale = self._scale * scale
+        scene._tips = (np.asarray(self._tips) * scale).tolist()
+        scene._fonts = [(color, max(1, round(width * scale)) if width > 0
+                         else width) for color, width in self._fonts]
+        scene._clock_sizes = [[size * scale for size in sizes]
+                              for sizes in self._clock_sizes]
+        scene._small = [[size < s_p.SPRITE_MAX_RADIUS for size in sizes]
+                        for sizes in scene._clock_sizes]
+        scene._sprites = {}
+
+        return scene
+
+    def __getstate__(self):
+        """leaves the sprites out of the scene
+        sent to worker processes"""
+
+        state = self.__dict__.copy()
+        state["_sprites"] = {}
+        return state
+
+    def size(self):
+        """getter"""
+
+        return self._size
+
+    def colors(self):
+        """returns every color the frames are drawn with,
+        the clocks first then the clock drawing"""
+
+        colors = [BLACK, GREEN, RED]
+        for color, width in self._fonts:
+            if color not in colors:
+                colors.append(color)
+
+        return colors
+
+    def point_count(self):
+        """returns the number of drawing points"""
+
+        return len(self._tips)
+
+    def frame_count(self):
+        """returns the number of frames, including the final drawing"""
+
+        return len(self._frame_points) + 1
+
+    def frame_point(self, i):
+        """returns the drawing point of the i-th frame"""
+
+        if i >= len(self._frame_points):
+            return len(self._tips)
+        return self._frame_points[i]
+
+    def draw_trail(self, surface, start, end, offset=(0, 0)):
+        """adds the lines ending at drawing points start to end
+        to the clock drawing if there was no jump,
+        on a surface showing the board from offset"""
+
+        tips = self._tips
+        fonts = self._fonts
+        breaks = self._breaks
+        x, y = offset
+        for p in range(start, end):
+            if breaks[p]:
+                continue
+            end_point = tips[p][0] - x, tips[p][1] - y
+            start_point = tips[p - 1][0] - x, tips[p - 1][1] - y
+
+            # wide lines of scaled boards get round joints
+            if self._scale == 1:
+                pygame.draw.line(surface, fonts[p][0], end_point,
+                                 start_point, fonts[p][1])
+            else:
+                _stroke(surface, fonts[p][0], start_point, end_point,
+                        fonts[p][1], p == 1 or breaks[p - 1])
+
+    def trail_rows(self, start, end):
+        """returns the first and last board rows (excluded) covered by
+        the lines ending at drawing points start to end"""
+
+        tips = np.asarray(self._tips[max(start - 1, 0):end])
+        width = max((font[1] for font in self._fonts[start:end]), default=0)
+
+        return tips[:, 1].min() - width, tips[:, 1].max() + width + 1
+
+    def geometry(self, first, last):
+        """Yields the clocks of frames first to last (excluded)
+        computed by blocks.
+
+        each frame gives its index, the board position of its
+        stacked clock centers and the board vectors of its clocks
+
+        """
+
+        last = min(last, len(self._frame_points))
+        i = first
+        while i < last:
+
+            # frames of the same segment are computed together
+            number = self._frame_segments[i]
+            start, count, coefficients, kept = self._segments[number]
+            end = bisect.bisect_right(self._frame_segments, number, i, last)
+            ks = [k - start for k in self._frame_points[i:end]]
+
+            blocks = e_c.frame_blocks(coefficients, self._drawn[number], ks,
+                                      self._dtype)
+            for block_ks, centers in blocks:
+
+                # clock positions on the board and clock vectors
+                board = self._board_centers(number, start + block_ks, centers)
+                proj_centers = board.tolist()
+                vectors = (board[:, 1:] - board[:, :-1]).tolist()
+
+                for j in range(len(block_ks)):
+                    yield i, proj_centers[j], vectors[j]
+                    i += 1
+
+    def _board_centers(self, number, points, centers):
+        """returns the board positions of the stacked clock centers
+        at some drawing points of a segment, ending with the
+        drawing tip if some clocks are not drawn"""
+
+        if self._scale != 1:
+            centers = centers * self._scale
+        board = e_c.to_board(self._size, centers)
+        if self._tails[number]:
+            tips = np.asarray([self._tips[p] for p in points])
+            board = np.concatenate([board, tips[:, np.newaxis]], axis=1)
+
+        return board
+
+    def descriptors(self):
+        """Yields the compact description of every frame.
+
+        A frame is described by its trail index (number of drawing
+        points in its clock drawing) and its overlay geometry,
+        the board positions of its stacked clock centers
+        as a float32 array (arrows go from each center to the next),
+        which is None for the final drawing.
+
+        """
+
+        last = len(self._frame_points)
+        i = 0
+        while i < last:
+
+            # frames of the same segment are computed together
+            number = self._frame_segments[i]
+            start, count, coefficients, kept = self._segments[number]
+            end = bisect.bisect_right(self._frame_segments, number, i, last)
+            ks = [k - start for k in self._frame_points[i:end]]
+
+            blocks = e_c.frame_blocks(coefficients, self._drawn[number], ks,
+                                      self._dtype)
+            for block_ks, centers in blocks:
+                board = self._board_centers(number, start + block_ks,
+                                            centers).astype(np.float32)
+                for j in range(len(block_ks)):
+                    yield self._frame_points[i], board[j]
+                    i += 1
+
+        yield len(self._tips), None
+
+    def compose(self, trail, i, descriptor):
+        """draws the i-th frame from its descriptor
+        on top of the clock drawing of a trail cursor"""
+
+        trail_index, centers = descriptor
+        trail.advance(trail_index)
+        frame = pygame.Surface(self._size, pygame.SRCALPHA)
+        frame.blit(trail.surface(), (0, 0))
+
+        if centers is not None:
+            vectors = (centers[1:] - centers[:-1]).tolist()
+            self.draw_clocks(frame, i, centers.tolist(), vectors)
+
+        return frame
+
+    def draw_clocks(self, surface, i, proj_center, vector, offset=(0, 0)):
+        """draws the clocks of the i-th frame and the drawing tip,
+        blitting small clocks from sprites in one batch
+
+        the clock centers are given on the surface,
+        which shows the board from offset
+
+        """
+
+        # each drawing thread has its own sprites
+        sprites = self._sprites.get(threading.get_ident())
+        if sprites is None:
+            sprites = s_p.SpriteCache(scale=self._scale)
+            self._sprites[threading.get_ident()] = sprites
+
+        number = self._frame_segments[i]
+        arrows = self._arrows[number]
+        small = self._small[number]
+        blits = []
+        for n, cof_mod in enumerate(self._clock_sizes[number]):
+
+            # draw arrow to point and point in green
+            if small[n]:
+                blits.append(sprites.circle(cof_mod, proj_center[n]))
+                if arrows[n]:
+                    blits.append(sprites.arrow(cof_mod, proj_center[n],
+                                               vector[n]))
+            else:
+                pygame.draw.circle(surface, BLACK, proj_center[n],
+                                   cof_mod, sprites.width())
+                if arrows[n]:
+                    sprites.draw_arrow(surface, proj_center[n], vector[n],
+                                       cof_mod / 100)
+            blits.append(sprites.dot(proj_center[n + 1]))
+
+        # draw the sum of the clocks too small to be drawn
+        if self._tails[number]:
+            n = len(self._clock_sizes[number])
+            length = l_u.c_mod(complex(*vector[n]))
+            if length < s_p.SPRITE_MAX_RADIUS:
+                blits.append(sprites.arrow(length, proj_center[n],
+                                           vector[n]))
+            else:
+                sprites.draw_arrow(surface, proj_center[n], vector[n],
+                                   length / 100)
+
+        surface.blits(blits, doreturn=False)
+
+        # print clock drawing tip in red
+        tip = self._tips[self._frame_points[i]]
+        pygame.draw.circle(surface, RED, (tip[0] - offset[0],
+                                          tip[1] - offset[1]),
+                           sprites.dot_radius(), 0)
+
+    def iter_frames(self, first=0, last=None):
+        """yields new surfaces of every frame from the first one
+        up to the last one (excluded)"""
+
+        if last is None:
+            last = self.frame_count()
+
+        trail = TrailCursor(self)
+        for i, proj_center, vector in self.geometry(first, last):
+
+            # create new drawing frame on top of the clock drawing
+            trail.advance(self._frame_points[i])
+            frame = pygame.Surface(self._size, pygame.SRCALPHA)
+            frame.blit(trail.surface(), (0, 0))
+
+            self.draw_clocks(frame, i, proj_center, vector)
+
+            yield frame
+
+        # add a frame with only the final drawing
+        if last == self.frame_count():
+            trail.advance(len(self._tips))
+            yield trail.surface()
+
+
+def _stroke(surface, color, start, end, width, start_cap):
+    """draws a wide line with round ends, looking the same
+    in every direction, the start end being left out
+    if the line continues another one"""
+
+    if width <= 0:
+        return
+
+    radius = max(1, round(width / 2))
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length = math.hypot(dx, dy)
+    if length > 0:
+
+        # the ends overlap the next line by a pixel so that no seam
+        # is left between them
+        ux, uy = dx / length, dy / length
+        nx, ny = -uy * radius, ux * radius
+        x0, y0 = start[0] - ux, start[1] - uy
+        x1, y1 = end[0] + ux, end[1] + uy
+        pygame.draw.polygon(surface, color, [
+            (x0 + nx, y0 + ny), (x1 + nx, y1 + ny),
+            (x1 - nx, y1 - ny), (x0 - nx, y0 - ny)])
+    pygame.draw.circle(surface, color, end, radius)
+    if start_cap:
+        pygame.draw.circle(surface, color, start, radius)
+
+
+# scene drawn by a worker process of the rasterization pool
+_worker_scene = None
+
+
+def _raster_init(scene):
+    """keeps the scene in the worker process"""
+
+    global _worker_scene
+    _worker_scene = scene
+
+
+def _raster_shard(first, last):
+    """draws frames first to last (excluded) in a worker process
+    and returns their RGBA pixel buffers"""
+
+    return [pygame.image.tobytes(frame, "RGBA")
+            for frame in _worker_scene.iter_frames(first, last)]
+
+
+def iter_parallel_frames(scene, job, workers=RASTER_WORKERS):
+    """Yields new surfaces of every frame of a scene (or of anything
+    drawing frames like a scene) drawn in a pool of worker processes.
+
+    the frames are split into shards of consecutive frames,
+    each worker drawing the clock drawing up to its shard
+    before drawing the shard headlessly, and the pixel buffers
+    come back in order with a bounded number of shards in flight
+
+    falls back to drawing in this thread for short animations
+    or a single worker, and stops early on the quit request of its job
+
+    """
+
+    frame_count = scene.frame_count()
+    if frame_count < RASTER_THRESHOLD or workers <= 1:
+        yield from scene.iter_frames()
+        return
+
+    size = scene.size()
+    frame_bytes = 4 * size[0] * size[1]
+    shards = max(workers * SHARDS_PER_WORKER,
+                 -(-frame_count * frame_bytes // SHARD_BYTES))
+    shards = min(shards, frame_count)
+    bounds = [frame_count * n // shards for n in range(shards + 1)]
+    shards = list(zip(bounds[:-1], bounds[1:]))
+
+    executor = concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=_raster_init, initargs=(scene,))
+    try:
+        # only keep twice as many shards as workers in flight
+        futures = [executor.submit(_raster_shard, first, last)
+                   for first, last in shards[:2 * workers]]
+        submitted = len(futures)
+        for n in range(len(shards)):
+
+            # wait for the next shard
+            future = futures[n]
+            while True:
+                # stop if requested
+                if job.quit_request:
+                    return
+                try:
+                    buffers = future.result(timeout=0.1)
+                    break
+                except concurrent.futures.TimeoutError:
+                    pass
+            futures[n] = None
+
+            if submitted < len(shards):
+                futures.append(executor.submit(_raster_shard,
+                                               *shards[submitted]))
+                submitted += 1
+
+            for buffer in buffers:
+                yield pygame.image.frombytes(buffer, size, "RGBA")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TrailCursor:
+    """clock drawing of a scene up to a drawing point,
+    only drawing the new lines when moving forward"""
+
+    def __init__(self, scene):
+        self._scene = scene
+        self._surface = pygame.Surface(scene.size(), pygame.SRCALPHA)
+        self._drawn = 0  # number of drawing points added to the drawing
+
+    def advance(self, point):
+        """brings the clock drawing up to a drawing point"""
+
+        # start again from an empty drawing to go back
+        if point < self._drawn:
+            self._surface = pygame.Surface(self._scene.size(),
+                                           pygame.SRCALPHA)
+            self._drawn = 0
+
+        self._scene.draw_trail(self._surface, self._drawn, point)
+        self._drawn = point
+
+    def surface(self):
+        """getter"""
+
+        return self._surface
+
+
+class FrameProducer:
+    """Draws the frames of a scene in a background thread
+    a few frames ahead of the playback position, so that
+    only a constant number of frames is held in memory."""
+
+    def __init__(self, scene, g_u_i, lookahead=LOOKAHEAD):
+        self._scene = scene
+        self._g_u_i = g_u_i
+        self._lookahead = lookahead
+        self._frames = {}  # drawn frames by index
+        self._position = 0  # first frame still needed
+        self._next = 0  # next frame to draw
+        self._restart = True  # whether drawing must restart at position
+        self._stopped = False
+        self._condition = threading.Condition()
+        threading.Thread(target=self._produce, daemon=True).start()
+
+    def get(self, i):
+        """returns the i-th frame if it was drawn, or None,
+        and forgets the frames before it"""
+
+        with self._condition:
+            self._seek(i)
+            return self._frames.get(i)
+
+    def is_ready(self, i):
+        """checks if the i-th frame was drawn"""
+
+        with self._condition:
+            return i in self._frames
+
+    def seek(self, i):
+        """makes the i-th frame the next frame to play"""
+
+        with self._condition:
+            self._seek(i)
+
+    def _seek(self, i):
+        """moves the playback position, restarting drawing
+        if the frame was already dropped"""
+
+        if i not in self._frames and i < self._next:
+            self._frames.clear()
+            self._restart = True
+        for index in [index for index in self._frames if index < i]:
+            del self._frames[index]
+        self._position = i
+        self._condition.notify_all()
+
+    def stop(self):
+        """stops drawing frames"""
+
+        with self._condition:
+            self._stopped = True
+            self._frames.clear()
+            self._condition.notify_all()
+
+    def _produce(self):
+        """draws frames ahead of the playback position"""
+
+        frames = None
+        index = 0  # index of the next drawn frame
+        while True:
+            with self._condition:
+
+                # wait for room in the lookahead buffer
+                while not self._stopped and not self._restart \
+                        and index >= self._position + self._lookahead:
+                    self._condition.wait(0.1)
+                    if self._g_u_i.quit_request:
+                        return
+
+                if self._stopped or self._g_u_i.quit_request:
+                    return
+
+                # restart drawing at the playback position
+                if self._restart:
+                    self._restart = False
+                    index = self._position
+                    self._next = index
+                    frames = self._scene.iter_frames(index)
+
+            frame = next(frames, None)
+
+            with self._condition:
+                # drawing restarted while drawing this frame
+                if self._restart:
+                    continue
+
+                if frame is None:
+                    # all frames drawn, wait for a seek
+                    while not self._stopped and not self._restart:
+                        self._condition.wait(0.1)
+                        if self._g_u_i.quit_request:
+                            return
+                    continue
+
+                # only keep frames that are still needed
+                if index >= self._position:
+                    self._frames[index] = frame
+                index += 1
+                self._next = index
+                self._condition.notify_all()
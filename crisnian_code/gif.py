@@ -0,0 +1,280 @@
+import struct
+import numpy as np
+
+# exact colors kept in the palette, the rest of the palette
+# being a color cube of the given levels per channel
+EXACT_COLORS = 40
+CUBE_LEVELS = 6
+
+# levels of the color cube and most antialiasing shades between
+# every known color and white or black, when the drawn colors
+# are known beforehand
+RAMP_CUBE_LEVELS = 5
+RAMP_STEPS = 16
+
+WHITE = 255, 255, 255
+BLACK = 0, 0, 0
+
+# bits per channel of the color lookup table
+LOOKUP_BITS = 5
+
+# largest lzw code of a gif
+MAX_CODE = 4095
+
+# bytes of a gif data sub-block
+BLOCK_SIZE = 255
+
+# longest delay of a gif frame, in hundredths of a second
+MAX_DELAY = 65535
+
+
+class Palette:
+    """The 256 colors of a gif, quantized once.
+
+    The colors the frames are drawn with are kept exactly, along with
+    their antialiasing shades over white and under black, when they
+    are known beforehand. Otherwise the most frequent colors of the
+    first frame are kept exactly. The palette is completed with a
+    color cube, and every color is mapped to its palette index
+    through a lookup table built once, so that later frames are
+    converted with a single indexing.
+
+    """
+
+    def __init__(self, frame, colors=None):
+        if colors is None:
+            colors, counts = np.unique(frame.reshape(-1, 3), axis=0,
+                                       return_counts=True)
+            exact = colors[np.argsort(-counts)[:EXACT_COLORS]]
+            levels = CUBE_LEVELS
+            shades = np.empty((0, 3), dtype=np.uint8)
+        else:
+            exact = _ordered_colors([WHITE] + list(colors))[:EXACT_COLORS]
+            levels = RAMP_CUBE_LEVELS
+            shades = _shades(exact, 256 - levels ** 3 - len(exact))
+
+        levels = np.linspace(0, 255, levels).astype(np.uint8)
+        cube = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"),
+                        axis=-1).reshape(-1, 3)
+
+        colors = np.unique(np.concatenate((exact, shades, cube)), axis=0)
+        self.colors = np.zeros((256, 3), dtype=np.uint8)
+        self.colors[:len(colors)] = colors
+
+        # nearest palette color of every lookup cell center
+        step = 1 << (8 - LOOKUP_BITS)
+        centers = np.arange(0, 256, step) + step // 2
+        cells = np.stack(np.meshgrid(centers, centers, centers,
+                                     indexing="ij"), axis=-1).reshape(-1, 3)
+        palette = colors.astype(np.int32)
+        self._lookup = np.empty(len(cells), dtype=np.uint8)
+        for start in range(0, len(cells), 4096):
+            block = cells[start:start + 4096, None, :] - palette[None, :, :]
+            distances = (block * block).sum(axis=2)
+            self._lookup[start:start + 4096] = distances.argmin(axis=1)
+
+        # exact colors map to themselves whatever their cell
+        indices = np.searchsorted(
+            _keys(colors), _keys(exact)).astype(np.uint8)
+        self._exact = dict(zip(_keys(exact).tolist(), indices.tolist()))
+
+    def indices(self, frame):
+        """returns the palette indices of the pixels of an RGB frame"""
+
+        shift = 8 - LOOKUP_BITS
+        cells = (frame >> shift).astype(np.int32)
+        cells = (cells[..., 0] << 2 * LOOKUP_BITS) \
+            | (cells[..., 1] << LOOKUP_BITS) | cells[..., 2]
+        indices = self._lookup[cells]
+
+        keys = _keys(frame)
+        for key, index in self._exact.items():
+            indices[keys == key] = index
+
+        return indices
+
+
+def _ordered_colors(colors):
+    """returns the distinct RGB colors of a list, in their order"""
+
+    distinct = []
+    for color in colors:
+        color = tuple(int(value) for value in color[:3])
+        if color not in distinct:
+            distinct.append(color)
+
+    return np.array(distinct, dtype=np.uint8).reshape(-1, 3)
+
+
+def _shades(colors, count):
+    """returns at most count antialiasing shades
+    between every color and white or black"""
+
+    ends = np.array((WHITE, BLACK), dtype=np.float64)
+    pairs = [(color, end) for color in colors.astype(np.float64)
+             for end in ends if (color != end).any()]
+    if not pairs or count <= 0:
+        return np.empty((0, 3), dtype=np.uint8)
+
+    steps = min(RAMP_STEPS, count // len(pairs))
+    fractions = np.arange(1, steps + 1) / (steps + 1)
+    shades = [color + (end - color) * fractions[:, None]
+              for color, end in pairs]
+
+    return np.round(np.concatenate(shades)).astype(np.uint8)
+
+
+def _keys(colors):
+    """returns one integer per RGB color"""
+
+    colors = colors.astype(np.int32)
+    return (colors[..., 0] << 16) | (colors[..., 1] << 8) | colors[..., 2]
+
+
+def lzw_encode(indices):
+    """returns the lzw code stream of gif pixel indices
+    with 8-bit minimum code size, packed into bytes"""
+
+    clear = 256
+    width = 9
+    next_code = clear + 2
+    table = {}
+    out = bytearray()
+
+    # code bits waiting to be packed
+    buffer = clear
+    bits = width
+
+    data = bytes(indices)
+    prefix = data[0]
+    for byte in data[1:]:
+        key = prefix << 8 | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+
+        buffer |= prefix << bits
+        bits += width
+        while bits >= 8:
+            out.append(buffer & 255)
+            buffer >>= 8
+            bits -= 8
+        if next_code >= 1 << width and width < 12:
+            width += 1
+        prefix = byte
+
+        # start a new table once every code is used
+        if next_code >= MAX_CODE:
+            buffer |= clear << bits
+            bits += width
+            while bits >= 8:
+                out.append(buffer & 255)
+                buffer >>= 8
+                bits -= 8
+            table.clear()
+            next_code = clear + 2
+            width = 9
+        else:
+            table[key] = next_code
+            next_code += 1
+
+    # last prefix and end of information code
+    for code in (prefix, clear + 1):
+        buffer |= code << bits
+        bits += width
+        if code == prefix and next_code >= 1 << width and width < 12:
+            width += 1
+    while bits > 0:
+        out.append(buffer & 255)
+        buffer >>= 8
+        bits -= 8
+
+    return bytes(out)
+
+
+class GifWriter:
+    """Writes frames into an animated gif file sharing one palette,
+    each frame only covering the pixels that changed since the
+    previous one, and held frames being single frames shown
+    for longer.
+
+    the palette is built from the colors the frames are drawn with
+    if they are given, and from the first frame otherwise
+
+    """
+
+    def __init__(self, file, size, fps, colors=None):
+        self._file = file
+        self._size = size
+        self._fps = fps
+        self._colors = colors
+        self._palette = None
+        self._previous = None  # palette indices of the previous frame
+
+    def write(self, frame, count=1):
+        """appends an RGB frame of shape (height, width, 3)
+        shown for count frames"""
+
+        if self._palette is None:
+            self._palette = Palette(frame, self._colors)
+            self._write_header()
+
+        indices = self._palette.indices(frame)
+
+        # only encode the rectangle that changed
+        if self._previous is None:
+            top, bottom, left, right = 0, indices.shape[0], \
+                0, indices.shape[1]
+        else:
+            changed = indices != self._previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            if len(rows) == 0:
+                top, bottom, left, right = 0, 1, 0, 1
+            else:
+                columns = np.flatnonzero(changed.any(axis=0))
+                top, bottom = rows[0], rows[-1] + 1
+                left, right = columns[0], columns[-1] + 1
+        self._previous = indices
+
+        # hundredths of a second the frame is shown for,
+        # continued beyond the longest delay by unchanged pixels
+        delay = round(100 * count / self._fps)
+        self._write_image(indices, (top, bottom, left, right),
+                          min(delay, MAX_DELAY))
+        while delay > MAX_DELAY:
+            delay -= MAX_DELAY
+            self._write_image(indices, (0, 1, 0, 1), min(delay, MAX_DELAY))
+
+    def _write_image(self, indices, rectangle, delay):
+        """writes the (top, bottom, left, right) rectangle of palette
+        indices over the previous frame, shown for the delay"""
+
+        top, bottom, left, right = rectangle
+
+        # graphic control extension: keep the previous frame under this one
+        self._file.write(b"\x21\xf9\x04" + struct.pack(
+            "<BHBB", 1 << 2, delay, 0, 0))
+
+        # image descriptor and lzw data sub-blocks
+        self._file.write(b"\x2c" + struct.pack(
+            "<HHHHB", left, top, right - left, bottom - top, 0))
+        data = lzw_encode(indices[top:bottom, left:right].tobytes())
+        self._file.write(b"\x08")
+        for start in range(0, len(data), BLOCK_SIZE):
+            block = data[start:start + BLOCK_SIZE]
+            self._file.write(bytes((len(block),)) + block)
+        self._file.write(b"\x00")
+
+    def _write_header(self):
+        """writes the screen descriptor, palette and looping extension"""
+
+        self._file.write(b"GIF89a" + struct.pack(
+            "<HHBBB", self._size[0], self._size[1], 0xf7, 0, 0))
+        self._file.write(self._palette.colors.tobytes())
+        self._file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def close(self):
+        """ends the gif"""
+
+        self._file.write(b"\x3b")
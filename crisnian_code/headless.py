@@ -0,0 +1,239 @@
+from pygui import gui
+from crisnian_code import crisnian_layer as c_l
+from crisnian_code import fourier_transform as f_t
+from crisnian_code import frames as f_r
+from crisnian_code import video as v_d
+from crisnian_code import segments as s_g
+import concurrent.futures
+import os
+import sys
+import time
+
+GUI_TITLE = "Crisnian"
+FONT_TYPE = "Arial"
+FONT_SIZE = 20
+FRAME_RATE = 30
+
+# width of the control panel on the left of the board
+PANEL_WIDTH = 220
+DEFAULT_SIZE = 650
+
+
+def headless_layer(size=DEFAULT_SIZE):
+    """creates the Crisnian layer without a display,
+    with a square board of the given side"""
+
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    gui_size = PANEL_WIDTH + size, size
+    g_u_i = gui.GUI(GUI_TITLE, gui_size, FRAME_RATE)
+    g_u_i.set_font(FONT_TYPE, FONT_SIZE)
+    c_layer = c_l.CrisnianLayer(g_u_i, gui_size)
+    g_u_i.add_layer("Crisnian layer", c_layer)
+
+    return c_layer
+
+
+def run_job(c_layer, name, function, *args):
+    """runs function(job, *args) as a job of the layer and waits for it,
+    returns the ended job
+
+    raises the error of the job, or CancelledError if it was cancelled
+
+    """
+
+    job = c_layer.jobs.submit(name, function, *args)
+    c_layer.jobs.wait(job)
+    job.future.result()
+
+    return job
+
+
+def render_file(input_path, output_paths, speed, harmonics=None, size=None,
+                backend=None, precision=None, per_stroke=False,
+                frame_mode=None, pipeline=False, cull=0, adaptive=False,
+                export_size=None, supersample=1, segmented=False,
+                resume=False, hold=0, hold_tolerance=v_d.HOLD_TOLERANCE,
+                log=sys.stdout):
+    """Imports an svg file, renders its clock drawing animation
+    and exports it into every output file in a single pass,
+    with no display and no dialogs.
+
+    in pipeline mode, frames are drawn while the encoder writes
+    the previous ones and none of them is kept
+
+    with an export size or supersampling, exported frames are drawn
+    again from the clocks at that size, and segmented exports are
+    encoded by segments in parallel worker processes, resuming
+    from the finished segments of an interrupted export if asked
+    (videos being encoded without segments if ffmpeg is not found
+    to join them)
+
+    frames differing from the previous one by at most the hold
+    tolerance per channel are exported as holds of it, and the
+    final drawing is held for hold more seconds
+
+    prints the time taken by each stage and returns them
+
+    """
+
+    # fail before rendering if an output cannot be written
+    for output_path in output_paths:
+        v_d.check_format(output_path)
+        if segmented and not s_g.can_segment(output_path):
+            raise RuntimeError("cannot encode " + output_path
+                               + " by segments")
+
+    # joining video segments needs ffmpeg
+    if segmented and not s_g.can_join()\
+            and any(s_g.needs_join(path) for path in output_paths):
+        print("ffmpeg was not found to join video segments: encoding "
+              "without segments", file=log, flush=True)
+        segmented = resume = False
+
+    timings = {}
+
+    def stage(name, seconds):
+        timings[name] = seconds
+        print("{:<10}{:9.3f}s".format(name, seconds), file=log, flush=True)
+
+    start = time.perf_counter()
+    c_layer = headless_layer(size or DEFAULT_SIZE)
+    animation = c_layer.animation
+    animation.set_speed(speed)
+    animation.set_harmonics(harmonics, None)
+    animation.set_per_stroke(per_stroke)
+    animation.set_cull(cull)
+    animation.set_adaptive(adaptive)
+    if backend is not None:
+        animation.set_fourier_backend(backend)
+    if precision is not None:
+        animation.set_precision(precision)
+    if frame_mode is not None:
+        animation.set_frame_mode(frame_mode)
+    c_layer.file_manager.set_export_size(export_size, supersample)
+    c_layer.file_manager.set_hold(hold, hold_tolerance)
+    stage("setup", time.perf_counter() - start)
+
+    file_manager = c_layer.file_manager
+    try:
+        job = run_job(c_layer, "import", file_manager.load_svg, input_path)
+        file_manager.set_drawing(job.future.result())
+        stage("import", job.duration())
+
+        if pipeline:
+            job = run_job(c_layer, "export", file_manager.render_video,
+                          output_paths, segmented, resume)
+            stage("transform", animation.timings()["transform"])
+            stage("pipeline", job.duration() - animation.timings()["transform"])
+
+        else:
+            job = animation.render()
+            if job is None:
+                raise RuntimeError("nothing to render")
+            c_layer.jobs.wait(job)
+            job.future.result()
+            stage("transform", animation.timings()["transform"])
+            stage("render", animation.timings()["frames"])
+
+            job = run_job(c_layer, "export", file_manager.write_video,
+                          output_paths, segmented, resume)
+            stage("encode", job.duration())
+
+    # stop every job before leaving
+    except (KeyboardInterrupt, concurrent.futures.CancelledError):
+        c_layer.jobs.cancel_all()
+        for job in c_layer.jobs.running():
+            c_layer.jobs.wait(job)
+        if segmented:
+            print("finished segments were kept: run again with --resume "
+                  "to go on", file=sys.stderr)
+        raise
+
+    stage("total", sum(timings.values()))
+
+    return timings
+
+
+def add_arguments(parser):
+    """adds the arguments of the render command to an argument parser"""
+
+    parser.add_argument("input", help="svg file to animate")
+    parser.add_argument("-o", "--output", nargs="+", default=["render.mp4"],
+                        help="files receiving the animation, in the format "
+                             "of their extension ("
+                             + ", ".join(v_d.FORMATS) + "), or - for raw "
+                             "RGB frames on the standard output")
+    parser.add_argument("--speed", type=int, default=5,
+                        help="drawing points per frame")
+    parser.add_argument("--harmonics", type=int,
+                        help="number of kept clocks (default: all)")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE,
+                        help="side of the square video in pixels")
+    parser.add_argument("--backend", choices=sorted(f_t.BACKENDS),
+                        default=f_t.DEFAULT_BACKEND,
+                        help="Fourier transform backend")
+    parser.add_argument("--precision", choices=sorted(f_t.PRECISIONS),
+                        default=f_t.DEFAULT_PRECISION,
+                        help="precision of the clock computations")
+    parser.add_argument("--strokes", action="store_true",
+                        help="transform every stroke separately")
+    parser.add_argument("--frames", choices=f_r.FRAME_MODES,
+                        default="stored",
+                        help="how frames are kept before encoding")
+    parser.add_argument("--cull", type=float, default=0,
+                        help="radius in pixels under which clocks are "
+                             "drawn as a single arrow")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="spread frames along the motion of the "
+                             "drawing tip instead of every speed-th point")
+    parser.add_argument("--export-size", type=int,
+                        help="side of the exported video in pixels, "
+                             "drawn again from the clocks "
+                             "(default: --size)")
+    parser.add_argument("--supersample", type=int, default=1,
+                        help="draw exported frames this many times "
+                             "larger and average them down, "
+                             "to smooth lines")
+    parser.add_argument("--segments", action="store_true",
+                        help="encode segments of the video in parallel "
+                             "worker processes and join them "
+                             "(mp4, webm and png only)")
+    parser.add_argument("--resume", action="store_true",
+                        help="go on from the finished segments of an "
+                             "interrupted export into the same files "
+                             "with the same parameters (implies "
+                             "--segments)")
+    parser.add_argument("--hold", type=float, default=0,
+                        help="seconds the final drawing is held for "
+                             "at the end of the video")
+    parser.add_argument("--hold-tolerance", type=int,
+                        default=v_d.HOLD_TOLERANCE,
+                        help="largest difference of a color channel "
+                             "(0 to 255) under which a frame is exported "
+                             "as a hold of the previous one (default: "
+                             "identical frames only)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="encode frames while they are drawn "
+                             "without keeping them")
+
+
+def run(args):
+    """runs the render command, returns the exit status"""
+
+    # the standard output may receive the frames instead of the timings
+    log = sys.stderr if v_d.STDOUT in args.output else sys.stdout
+
+    try:
+        render_file(args.input, args.output, args.speed, args.harmonics,
+                    args.size, args.backend, args.precision, args.strokes,
+                    args.frames, args.pipeline, args.cull, args.adaptive,
+                    args.export_size, args.supersample,
+                    args.segments or args.resume, args.resume, args.hold,
+                    args.hold_tolerance, log)
+    except (ValueError, RuntimeError) as error:
+        print("error:", error, file=sys.stderr)
+        return 1
+
+    return 0
@@ -0,0 +1,234 @@
+import concurrent.futures
+import queue
+import sys
+import threading
+import time
+import traceback
+
+
+class Event:
+    """something that happened to a job,
+    handled by the thread polling the scheduler"""
+
+    def __init__(self, job):
+        self.job = job
+
+
+class Progress(Event):
+    """a stage of a job reached a percentage,
+    with an optional detail of its progress"""
+
+    def __init__(self, job, stage, percent, detail=None):
+        super().__init__(job)
+        self.stage = stage
+        self.percent = percent
+        self.detail = detail
+
+
+class Finished(Event):
+    """a job returned its result"""
+
+    def __init__(self, job, result):
+        super().__init__(job)
+        self.result = result
+
+
+class Failed(Event):
+    """a job raised an error"""
+
+    def __init__(self, job, error):
+        super().__init__(job)
+        self.error = error
+
+
+class Cancelled(Event):
+    """a job stopped early because it was cancelled
+    or the application is quitting"""
+
+
+def print_error(event):
+    """prints the error of a failed job with its traceback"""
+
+    error = event.error
+    print("job " + event.job.name + " failed:", file=sys.stderr)
+    traceback.print_exception(type(error), error, error.__traceback__,
+                              file=sys.stderr)
+
+
+class Job:
+    """An operation running in its own thread.
+
+    The operation receives its job as first argument, stops early
+    once the job's quit_request is set (when the job is cancelled
+    or the application quits) and reports its progress through it.
+    Its result is given by the job's future, and the job records
+    when it was submitted, started and finished.
+
+    """
+
+    def __init__(self, name, g_u_i=None, events=None):
+        self.name = name
+        self.future = concurrent.futures.Future()
+        self._g_u_i = g_u_i
+        self._events = events  # queue receiving the events of the job
+        self._cancel = threading.Event()
+        self._stage = name  # stage of the reported progress
+        self._percents = {}  # last reported percentage of every stage
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+
+    @property
+    def quit_request(self):
+        """checks if the operation must stop"""
+
+        return self._cancel.is_set() or \
+            (self._g_u_i is not None and self._g_u_i.quit_request)
+
+    def cancel(self):
+        """asks the operation to stop"""
+
+        self._cancel.set()
+
+    def done(self):
+        """checks if the operation ended"""
+
+        return self.future.done()
+
+    def set_stage(self, stage):
+        """sets the stage of the next reported progress"""
+
+        self._stage = stage
+
+    def progress(self, percent, stage=None, detail=None):
+        """reports the percentage reached by a stage of the operation,
+        only sending an event when the percentage or detail changed"""
+
+        stage = self._stage if stage is None else stage
+        percent = int(percent)
+        if self._percents.get(stage) != (percent, detail):
+            self._percents[stage] = percent, detail
+            self._post(Progress(self, stage, percent, detail))
+
+    def duration(self):
+        """returns the seconds the operation ran for (so far)"""
+
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None \
+            else time.perf_counter()
+        return end - self.started
+
+    def _post(self, event):
+        """sends an event to the scheduler"""
+
+        if self._events is not None:
+            self._events.put(event)
+
+    def run(self, function, args=()):
+        """runs the operation in this thread and settles the future"""
+
+        self.started = time.perf_counter()
+        self.future.set_running_or_notify_cancel()
+        try:
+            result = function(self, *args)
+        except Exception as error:
+            self.finished = time.perf_counter()
+            self.future.set_exception(error)
+            self._post(Failed(self, error))
+            return
+        self.finished = time.perf_counter()
+
+        if self.quit_request:
+            self.future.set_exception(concurrent.futures.CancelledError())
+            self._post(Cancelled(self))
+        else:
+            self.future.set_result(result)
+            self._post(Finished(self, result))
+
+
+class JobScheduler:
+    """Runs jobs in their own threads and hands their events
+    to the thread that polls it (the UI thread), so that only
+    this thread updates the user interface.
+
+    each job has a progress handler receiving its Progress events
+    and an end handler receiving its Finished, Failed or Cancelled
+    event
+
+    """
+
+    def __init__(self, g_u_i=None):
+        self._g_u_i = g_u_i
+        self._events = queue.Queue()
+        self._handlers = {}  # progress and end handlers of every job
+        self._jobs = []  # jobs whose end was not handled yet
+        self._waited = set()  # jobs whose caller reads the future
+
+    def submit(self, name, function, *args, on_progress=None, on_end=None):
+        """starts running function(job, *args) in a new thread,
+        returns its job"""
+
+        job = Job(name, self._g_u_i, self._events)
+        self._handlers[job] = on_progress, on_end
+        self._jobs.append(job)
+        threading.Thread(target=job.run, args=(function, args),
+                         name=name).start()
+
+        return job
+
+    def poll(self):
+        """handles every waiting event in this thread"""
+
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return
+            self._handle(event)
+
+    def wait(self, job):
+        """waits for the end of a job, handling the events
+        of every job in this thread meanwhile
+
+        the error of the job is left to the caller reading its future
+
+        """
+
+        self._waited.add(job)
+        while job in self._jobs:
+            try:
+                event = self._events.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self._handle(event)
+
+    def _handle(self, event):
+        """calls the handler of an event"""
+
+        on_progress, on_end = self._handlers.get(event.job, (None, None))
+        if isinstance(event, Progress):
+            if on_progress is not None:
+                on_progress(event)
+            return
+
+        # the job ended
+        self._jobs.remove(event.job)
+        del self._handlers[event.job]
+        if on_end is not None:
+            on_end(event)
+        elif isinstance(event, Failed) and event.job not in self._waited:
+            print_error(event)
+        self._waited.discard(event.job)
+
+    def running(self, name=None):
+        """returns the jobs whose end was not handled yet,
+        only the ones of the given name if any"""
+
+        return [job for job in self._jobs if name is None or job.name == name]
+
+    def cancel_all(self):
+        """asks every job to stop"""
+
+        for job in self._jobs:
+            job.cancel()
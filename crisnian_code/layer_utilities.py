@@ -1,6 +1,10 @@
 import math
 import cmath
 
+# number of coefficients computed between two
+# progress updates and cancellation checks
+CHUNK_SIZE = 16
+
 
 def c_mod(z):
     """returns modulus of complex number"""
@@ -19,8 +23,8 @@ def board_to_complex(size, pos):
     return pos[0] - size[0]+size[1]/2 + (size[1]/2 - pos[1]) * 1j
 
 
-def discrete_fourier_transform(sequence, fourier_coefficients, g_u_i,
-                               animation, percent_split):
+def discrete_fourier_transform(sequence, fourier_coefficients, job,
+                               percent_split):
     """Computes Discrete Fourier coefficients
     for the points of the manual or loaded drawing
 
@@ -41,21 +45,22 @@ def discrete_fourier_transform(sequence, fourier_coefficients, g_u_i,
 
     # compute discrete fourier transform coefficients
     for n in range(N):
+
+        # stop if requested and display percentage progress
+        # once per chunk of coefficients
+        if n % CHUNK_SIZE == 0:
+            if job.quit_request:
+                return
+            percent = int(percent_split * (n / N))
+            job.progress(percent)
+
         # nth-fourier coefficient
         xn = 0
         exp_base = cmath.exp(-2j * cmath.pi * n / N)
         exp = 1
 
-        # display percentage progress
-        percent = int(percent_split * (n / N))
-        animation.display_rendering_percentage(percent)
-
         for k, point in enumerate(sequence):
 
-            # stop if requested
-            if g_u_i.quit_request:
-                return
-
             # add new term to the discrete fourier coefficient
             xn += (point / exp) / N
 
@@ -63,4 +68,4 @@ def discrete_fourier_transform(sequence, fourier_coefficients, g_u_i,
             exp *= exp_base
 
         # add new fourier coefficient
-        fourier_coefficients.append(xn)
\ No newline at end of file
+        fourier_coefficients.append(xn)
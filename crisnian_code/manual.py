@@ -1,6 +1,7 @@
 import pygame
 from pygui import colors as col
 from crisnian_code import layer_utilities as l_u
+from crisnian_code import fourier_transform as f_t
 from utility_functions import geometrical_functions as g_f
 import colorsys
 
@@ -19,6 +20,7 @@ class Manual:
         self._rgb_font = ((0, 0, 0), 5)
         self._hsv_font = ((0, 0, 0), 5)
         self._point_list = []
+        self._live_transform = f_t.LiveTransform()
         self._animation = None
         self._showing = True
         self._erasing = False
@@ -40,6 +42,7 @@ class Manual:
         self._animation.update_time()
         self.reset()
         self._point_list.clear()
+        self._live_transform.reset()
         self._animation.no_render()
 
     def show(self):
@@ -96,12 +99,14 @@ class Manual:
 
         fonts = [self._rgb_font] * len(point_array)
         self._point_list.extend(zip(point_array, fonts))
+        self._live_transform.extend(point_array)
         self.update_drawing()
 
     def increment(self, point):
         """extends the point list with a new point"""
 
         self._point_list.append((point, self._rgb_font))
+        self._live_transform.append(point)
         self.update_drawing()
 
     def __getitem__(self, key):
@@ -156,6 +161,15 @@ class Manual:
         color = g_f.scale_vector(norm_col, 255)
         self._rgb_font = color, self._rgb_font[1]
 
+    def rgb_font(self, hsv):
+        """returns the font of a color given in hsv
+        at the current font size"""
+
+        hsv = tuple(min(1, max(0, value)) for value in hsv)
+        norm_col = colorsys.hsv_to_rgb(*hsv)
+        color = g_f.scale_vector(norm_col, 255)
+        return color, self._rgb_font[1]
+
     def set_size(self, font_size):
         """changes font size"""
 
@@ -172,10 +186,16 @@ class Manual:
 
         return self._point_list
 
+    def live_transform(self):
+        """getter"""
+
+        return self._live_transform
+
     def set_point_list(self, point_list):
         """setter"""
 
         self._point_list = point_list
+        self._live_transform.reset([point for point, font in point_list])
         self.full_redraw()
 
     def enable_clearing(self, value):
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import numpy as np
+
+CACHE_DIRECTORY = "cache"
+CACHE_SIZE_LIMIT = 256 * 1024 * 1024  # bytes
+
+
+def key(*parts):
+    """Returns a content hash of the given parts.
+
+    parts can be arrays, strings or any object with a stable repr
+
+    """
+
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(str(part.dtype).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, bytes):
+            digest.update(part)
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"|")
+
+    return digest.hexdigest()
+
+
+def font_array(fonts):
+    """packs a list of ((r, g, b), size) fonts into an array"""
+
+    return np.array([(*color, size) for color, size in fonts],
+                    dtype=np.float64).reshape(-1, 4)
+
+
+class RenderCache:
+    """Content-addressed on-disk cache for Fourier coefficients,
+    with least recently used eviction once the cache grows
+    over its size limit"""
+
+    def __init__(self, directory=CACHE_DIRECTORY,
+                 size_limit=CACHE_SIZE_LIMIT):
+        self._directory = directory
+        self._size_limit = size_limit
+
+    def _path(self, entry_key, extension):
+        """returns the file path of a cache entry"""
+
+        return os.path.join(self._directory, entry_key + extension)
+
+    def _read(self, path):
+        """marks an entry as recently used and checks that it exists"""
+
+        try:
+            os.utime(path)
+        except OSError:
+            return False
+
+        return True
+
+    def _write(self, path, save):
+        """writes an entry atomically then evicts old entries"""
+
+        # Create cache directory if it does not exist
+        if not os.path.exists(self._directory):
+            os.makedirs(self._directory)
+
+        # write to a temporary file so that readers never see
+        # a partial entry
+        temp_path = path + ".part"
+        try:
+            save(temp_path)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self.evict()
+
+    def load_coefficients(self, entry_key):
+        """returns cached coefficients or None"""
+
+        path = self._path(entry_key, ".npy")
+        if not self._read(path):
+            return None
+
+        try:
+            return np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    def store_coefficients(self, entry_key, coefficients):
+        """caches coefficients"""
+
+        array = np.asarray(coefficients, dtype=np.complex128)
+
+        def save(path):
+            with open(path, "wb") as file:
+                np.save(file, array, allow_pickle=False)
+
+        self._write(self._path(entry_key, ".npy"), save)
+
+    def evict(self):
+        """removes least recently used entries until
+        the cache fits in its size limit"""
+
+        if not os.path.exists(self._directory):
+            return
+
+        # list entries with their size and last use
+        entries = []
+        for filename in os.listdir(self._directory):
+            if filename.endswith(".part"):
+                continue
+            path = os.path.join(self._directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # remove the oldest entries first
+        total = sum(size for used, size, path in entries)
+        for used, size, path in sorted(entries):
+            if total <= self._size_limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
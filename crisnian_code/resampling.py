@@ -0,0 +1,124 @@
+import numpy as np
+
+# distance between two successive points
+# over which the drawing is not connected
+JUMP_DISTANCE = 5
+
+
+def stroke_breaks(points):
+    """returns a boolean array marking the points
+    that start a new stroke"""
+
+    points = np.asarray(points, dtype=np.complex128)
+    breaks = np.ones(len(points), dtype=bool)
+    breaks[1:] = np.abs(np.diff(points)) >= JUMP_DISTANCE
+
+    return breaks
+
+
+def fft_friendly(n):
+    """returns the smallest number of the form 2^a*3^b*5^c
+    that is at least n"""
+
+    best = None
+    power_5 = 1
+    while power_5 < 2 * max(n, 1):
+        power_35 = power_5
+        while power_35 < 2 * max(n, 1):
+            # smallest power of two bringing the product to n
+            candidate = power_35
+            while candidate < n:
+                candidate *= 2
+            if best is None or candidate < best:
+                best = candidate
+            power_35 *= 3
+        power_5 *= 5
+
+    return best
+
+
+def _allocate(lengths, samples):
+    """splits samples between strokes proportionally to their
+    length, with at least one sample per stroke"""
+
+    strokes = len(lengths)
+    total = lengths.sum()
+    if total == 0:
+        shares = np.full(strokes, (samples - strokes) / strokes)
+    else:
+        shares = (samples - strokes) * lengths / total
+
+    # give the remaining samples to the largest fractional parts
+    counts = 1 + np.floor(shares).astype(int)
+    remaining = samples - counts.sum()
+    if remaining > 0:
+        order = np.argsort(-(shares - np.floor(shares)), kind="stable")
+        counts[order[:remaining]] += 1
+
+    return counts
+
+
+def resample(points, fonts, samples):
+    """Resamples a drawing to a number of points evenly spaced
+    by arc length inside each stroke.
+
+    Strokes keep their first and last points and get a number of
+    samples proportional to their length. Each new point takes the
+    font of the point that starts its segment.
+
+    returns the new points, their fonts and the stroke breaks
+    (new strokes cannot be told apart by distance anymore
+    when samples are further apart than the jump distance)
+
+    """
+
+    points = np.asarray(points, dtype=np.complex128)
+    breaks = stroke_breaks(points)
+
+    # bounds of every stroke
+    starts = np.flatnonzero(breaks)
+    ends = np.append(starts[1:], len(points))
+
+    # need at least one sample per stroke
+    samples = max(int(samples), len(starts))
+
+    # arc length from the start of the drawing, not counting jumps
+    steps = np.abs(np.diff(points))
+    steps[breaks[1:]] = 0
+    arc = np.concatenate(([0.0], np.cumsum(steps)))
+    lengths = arc[ends - 1] - arc[starts]
+
+    counts = _allocate(lengths, samples)
+
+    new_points = np.empty(samples, dtype=np.complex128)
+    new_fonts = []
+    new_breaks = np.zeros(samples, dtype=bool)
+    position = 0
+    for start, end, count in zip(starts, ends, counts):
+
+        stroke_arc = arc[start:end]
+        new_breaks[position] = True
+
+        # arc length of the new points of the stroke
+        if count == 1 or end - start == 1:
+            targets = np.full(count, stroke_arc[0])
+        else:
+            targets = np.linspace(stroke_arc[0], stroke_arc[-1], count)
+
+        # segment of the stroke containing each new point
+        segment = np.searchsorted(stroke_arc, targets, side="right") - 1
+        segment = np.clip(segment, 0, max(end - start - 2, 0))
+        first = start + segment
+        second = np.minimum(first + 1, end - 1)
+
+        # interpolate inside the segment
+        segment_length = stroke_arc[second - start] - stroke_arc[segment]
+        ratio = np.divide(targets - stroke_arc[segment], segment_length,
+                          out=np.zeros(count), where=segment_length > 0)
+        new_points[position:position + count] = \
+            points[first] + (points[second] - points[first]) * ratio
+        new_fonts.extend(fonts[i] for i in first)
+
+        position += count
+
+    return new_points, new_fonts, new_breaks
@@ -0,0 +1,322 @@
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import pygame
+from pygui import colors as col
+from crisnian_code import video as v_d
+
+WHITE = col.WHITE
+
+# formats that can be encoded by segments
+SEGMENT_FORMATS = (".mp4", ".webm", ".png")
+
+# segments given to every worker, so that workers
+# finishing early take the remaining ones
+SEGMENTS_PER_WORKER = 2
+
+# file listing the finished segments of an export
+CHECKPOINT = "checkpoint.json"
+
+
+def can_segment(file_path):
+    """checks if a file can be encoded by segments"""
+
+    return os.path.splitext(file_path)[1].lower() in SEGMENT_FORMATS
+
+
+def needs_join(file_path):
+    """checks if the segments of a file must be joined,
+    which is the case of videos but not of png sequences"""
+
+    return os.path.splitext(file_path)[1].lower() != ".png"
+
+
+def can_join():
+    """checks if video segments can be joined, which needs ffmpeg"""
+
+    return shutil.which("ffmpeg") is not None
+
+
+def segment_bounds(frame_count, segments, key_interval=v_d.KEY_INTERVAL):
+    """splits frames into at most the given number of
+    (first, last excluded) ranges made of whole key frame intervals"""
+
+    intervals = -(-frame_count // key_interval)
+    segments = max(1, min(segments, intervals))
+    bounds = [min(frame_count, key_interval * (intervals * n // segments))
+              for n in range(segments + 1)]
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _segment_target(file_path, directory, number, first):
+    """returns the file a segment is encoded into and its first frame
+    number: video segments get their own file and png segments
+    are numbered within the sequence"""
+
+    if not needs_join(file_path):
+        return file_path, first
+
+    root, extension = os.path.splitext(os.path.basename(file_path))
+    return os.path.join(directory, "{}_{:04d}{}".format(
+        root, number, extension)), 0
+
+
+# scene encoded by a worker process, queue receiving the
+# (segment, encoded frames) progress of the workers
+# and event asking them to stop
+_worker_scene = None
+_worker_progress = None
+_worker_stop = None
+
+
+def _encode_init(scene, progress, stop):
+    """keeps the scene and communication objects in the worker process"""
+
+    global _worker_scene, _worker_progress, _worker_stop
+    _worker_scene = scene
+    _worker_progress = progress
+    _worker_stop = stop
+
+
+def _encode_segment(number, first, last, targets, hold=0,
+                    tolerance=v_d.HOLD_TOLERANCE):
+    """draws frames first to last (excluded) in a worker process
+    and encodes them into the (file, first frame number) targets,
+    the last frame being held for hold more frames and frames
+    within the tolerance of the previous one repeating it
+
+    returns False if encoding was stopped
+
+    """
+
+    size = _worker_scene.size()
+    streams = []
+    try:
+        for file_path, start in targets:
+            streams.append(v_d.open_stream(file_path, size, first=start))
+
+        # every frame is drawn on the same white background
+        surf = pygame.Surface(size)
+        runs = v_d.RunWriter(streams, tolerance)
+        for frame in _worker_scene.iter_frames(first, last):
+            if _worker_stop.is_set():
+                for stream in streams:
+                    stream.abort()
+                return False
+
+            surf.fill(WHITE)
+            surf.blit(frame, (0, 0))
+            runs.write(surf)
+            _worker_progress.put((number, min(stream.encoded()
+                                              for stream in streams)))
+
+        runs.finish(hold)
+        for stream in streams:
+            stream.close()
+    except RuntimeError:
+        for stream in streams:
+            stream.abort()
+        raise
+
+    _worker_progress.put((number, last - first))
+    return True
+
+
+def join_segments(segment_paths, file_path):
+    """Joins video segments into one file with ffmpeg,
+    copying them without encoding them again
+
+    raises RuntimeError if the file cannot be written
+
+    """
+
+    list_path = os.path.join(os.path.dirname(segment_paths[0]),
+                             "segments.txt")
+    with open(list_path, "w") as file:
+        for path in segment_paths:
+            path = os.path.abspath(path).replace("'", "'\\''")
+            file.write("file '" + path + "'\n")
+    result = subprocess.run(
+        [shutil.which("ffmpeg"), "-y", "-loglevel", "error", "-f", "concat",
+         "-safe", "0", "-i", list_path, "-c", "copy", file_path],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError("joining the segments of " + file_path
+                           + " failed: " + result.stderr.strip())
+
+
+def checkpoint_directory(file_path):
+    """returns the directory keeping the segments
+    and checkpoint of an export into a file"""
+
+    return os.path.splitext(os.path.abspath(file_path))[0] + ".segments"
+
+
+def load_checkpoint(file_paths, parameters):
+    """returns the checkpoint of an interrupted export into the same
+    files with the same parameters, or None if there is none"""
+
+    path = os.path.join(checkpoint_directory(file_paths[0]), CHECKPOINT)
+    try:
+        with open(path) as file:
+            checkpoint = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    # parameters as they were saved
+    parameters = json.loads(json.dumps(parameters))
+    if checkpoint.get("outputs") != [os.path.abspath(file_path)
+                                     for file_path in file_paths]\
+            or checkpoint.get("parameters") != parameters:
+        return None
+
+    return checkpoint
+
+
+def _save_checkpoint(directory, checkpoint):
+    """writes a checkpoint, replacing the previous one at once"""
+
+    path = os.path.join(directory, CHECKPOINT)
+    with open(path + ".tmp", "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(path + ".tmp", path)
+
+
+def encode_segments(scene, file_paths, job, workers, parameters=None,
+                    resume=False, hold=0, tolerance=v_d.HOLD_TOLERANCE):
+    """Encodes the frames of a scene (or of anything drawing frames
+    like a scene) into mp4, webm or png files by segments.
+
+    The frames are split into segments of whole key frame intervals,
+    each segment being drawn and encoded by a worker process, so that
+    encoding uses every core. The segments of each video are then
+    joined into the video by ffmpeg, whose last frame is held for
+    hold more frames. Frames within the tolerance of the previous
+    one are exported as holds of it.
+
+    Given the parameters the frames depend on, the segments are kept
+    next to the first file with a checkpoint listing the finished
+    ones, which are left when encoding is stopped or fails, so that
+    a later export of the same files with the same parameters can
+    resume from them.
+
+    the progress of the job gives the number of finished segments,
+    returns False if encoding was stopped,
+    raises RuntimeError if a file cannot be exported
+
+    """
+
+    for file_path in file_paths:
+        if not can_segment(file_path):
+            raise RuntimeError("cannot encode " + file_path + " by segments:"
+                               " supported formats are "
+                               + ", ".join(SEGMENT_FORMATS))
+        if needs_join(file_path) and not can_join():
+            raise RuntimeError("cannot encode " + file_path + " by segments:"
+                               " ffmpeg is needed to join them")
+
+    frame_count = scene.frame_count()
+    checkpoint = None
+    finished = set()
+    if parameters is None:
+        bounds = segment_bounds(frame_count, workers * SEGMENTS_PER_WORKER)
+        directory = tempfile.mkdtemp(
+            prefix=".segments_",
+            dir=os.path.dirname(os.path.abspath(file_paths[0])))
+    else:
+        directory = checkpoint_directory(file_paths[0])
+        if resume:
+            checkpoint = load_checkpoint(file_paths, parameters)
+
+        # start again from no segment
+        if checkpoint is None:
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            checkpoint = {
+                "outputs": [os.path.abspath(file_path)
+                            for file_path in file_paths],
+                "parameters": parameters,
+                "bounds": segment_bounds(frame_count,
+                                         workers * SEGMENTS_PER_WORKER),
+                "finished": []}
+            _save_checkpoint(directory, checkpoint)
+
+        bounds = [tuple(bound) for bound in checkpoint["bounds"]]
+        finished = set(checkpoint["finished"])
+
+    progress = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    done_joining = False
+
+    executor = concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=_encode_init, initargs=(scene, progress, stop))
+    try:
+        pending = {}
+        for number, (first, last) in enumerate(bounds):
+            if number in finished:
+                continue
+            targets = [_segment_target(file_path, directory, number, first)
+                       for file_path in file_paths]
+            pending[executor.submit(
+                _encode_segment, number, first, last, targets,
+                hold if last == frame_count else 0, tolerance)] = number
+
+        encoded = [last - first if number in finished else 0
+                   for number, (first, last) in enumerate(bounds)]
+        while pending:
+
+            # stop encoding if requested
+            if job.quit_request:
+                stop.set()
+                return False
+
+            done, waiting = concurrent.futures.wait(pending, timeout=0.1)
+            for future in done:
+                number = pending.pop(future)
+                if not future.result():
+                    return False
+                finished.add(number)
+
+                # remember the finished segment
+                if checkpoint is not None:
+                    checkpoint["finished"] = sorted(finished)
+                    _save_checkpoint(directory, checkpoint)
+
+            # frames encoded by every segment
+            while True:
+                try:
+                    number, count = progress.get_nowait()
+                except queue.Empty:
+                    break
+                encoded[number] = max(encoded[number], count)
+
+            job.progress(99 * sum(encoded) / frame_count,
+                         detail="{}/{}".format(len(finished), len(bounds)))
+
+        # join the segments of every video
+        for file_path in file_paths:
+            if not needs_join(file_path):
+                continue
+            segment_paths = [_segment_target(file_path, directory, number,
+                                             first)[0]
+                             for number, (first, last) in enumerate(bounds)]
+            join_segments(segment_paths, file_path)
+        done_joining = True
+
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+        # segments are only kept to resume from their checkpoint
+        if checkpoint is None or done_joining:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    job.progress(100, detail="{}/{}".format(len(bounds), len(bounds)))
+
+    return True
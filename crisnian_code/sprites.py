@@ -0,0 +1,142 @@
+import math
+import pygame
+from pygui import colors as col, drawing_functions as d_f
+from utility_functions import geometrical_functions as g_f
+
+BLACK = col.BLACK
+GREEN = col.GREEN
+WHITE = col.WHITE
+
+# clocks are blitted from pre-rasterized sprites below this radius,
+# larger ones are faster to draw directly
+SPRITE_MAX_RADIUS = 16
+
+# number of directions arrows and arrow heads are rasterized in
+ARROW_ANGLES = 256
+
+# empty border around the sprites
+PADDING = 3
+
+CLOCK_WIDTH = 2
+DOT_RADIUS = 2
+
+
+def _sprite(radius):
+    """returns a new empty sprite holding a clock of the given radius,
+    white being transparent"""
+
+    side = 2 * (radius + PADDING)
+    sprite = pygame.Surface((side, side))
+    sprite.fill(WHITE)
+    sprite.set_colorkey(WHITE, pygame.RLEACCEL)
+    return sprite
+
+
+class SpriteCache:
+    """Pre-rasterized clock circles, arrows and dots of an animation.
+
+    Circles are kept by integer radius and arrows by integer radius
+    and quantized direction, so that the clocks of a frame are
+    composed with a batch of blits. Sprites are drawn the first time
+    they are needed. Clocks at least SPRITE_MAX_RADIUS wide are drawn
+    directly, with their arrow heads kept by quantized direction
+    and size.
+
+    circle widths and dots are scaled for boards drawn larger
+    than the screen
+
+    """
+
+    def __init__(self, angles=ARROW_ANGLES, scale=1):
+        self._angles = angles
+        self._circles = {}  # circle sprites by radius
+        self._arrows = {}  # arrow sprites by radius and direction
+        self._heads = {}  # arrow head corners by size and direction
+        self._width = max(1, round(CLOCK_WIDTH * scale))
+
+        self._dot_radius = max(1, round(DOT_RADIUS * scale))
+        self._dot = _sprite(self._dot_radius)
+        pygame.draw.circle(self._dot, GREEN,
+                           (self._dot_radius + PADDING,) * 2,
+                           self._dot_radius, 0)
+
+    def _direction(self, vector):
+        """returns the quantized direction of a vector"""
+
+        angle = math.atan2(vector[1], vector[0])
+        return round(angle * self._angles / (2 * math.pi)) % self._angles
+
+    def circle(self, radius, center):
+        """returns the sprite and position of a circle
+        to blit, for a small clock"""
+
+        radius = int(radius)
+        sprite = self._circles.get(radius)
+        if sprite is None:
+            sprite = _sprite(radius)
+            pygame.draw.circle(sprite, BLACK, (radius + PADDING,) * 2,
+                               radius, self._width)
+            self._circles[radius] = sprite
+
+        # pygame truncates the centers of drawn circles
+        offset = radius + PADDING
+        return sprite, (int(center[0]) - offset, int(center[1]) - offset)
+
+    def dot(self, center):
+        """returns the sprite and position of a clock center dot to blit"""
+
+        offset = self._dot_radius + PADDING
+        return self._dot, (int(center[0]) - offset, int(center[1]) - offset)
+
+    def arrow(self, radius, origin, vector):
+        """returns the sprite and position of an arrow to blit,
+        for a small clock"""
+
+        radius = int(radius)
+        direction = self._direction(vector)
+        sprite = self._arrows.get((radius, direction))
+        if sprite is None:
+            angle = 2 * math.pi * direction / self._angles
+            sprite = _sprite(radius)
+            center = (radius + PADDING,) * 2
+            d_f.draw_arrow(sprite, center, (radius * math.cos(angle),
+                                            radius * math.sin(angle)),
+                           BLACK, radius / 100)
+            self._arrows[(radius, direction)] = sprite
+
+        offset = radius + PADDING
+        return sprite, (int(origin[0]) - offset, int(origin[1]) - offset)
+
+    def width(self):
+        """returns the width of clock circles"""
+
+        return self._width
+
+    def dot_radius(self):
+        """returns the radius of clock center dots"""
+
+        return self._dot_radius
+
+    def draw_arrow(self, surface, origin, vector, size):
+        """draws an arrow with the head corners of its direction and size,
+        like drawing_functions.draw_arrow"""
+
+        if not g_f.non_zero_2d_vec(vector):
+            return
+
+        direction = self._direction(vector)
+        head_size = round(d_f.ARROW_HEAD_SIZE * size, 1)
+        head = self._heads.get((head_size, direction))
+        if head is None:
+            angle = 2 * math.pi * direction / self._angles
+            ux, uy = math.cos(angle), math.sin(angle)
+            head = (head_size * (-ux - uy), head_size * (-uy + ux),
+                    head_size * (-ux + uy), head_size * (-uy - ux))
+            self._heads[(head_size, direction)] = head
+
+        end = origin[0] + vector[0], origin[1] + vector[1]
+        pygame.draw.line(surface, BLACK, origin, end,
+                         width=max(1, int(5 * size)))
+        pygame.draw.polygon(surface, BLACK, [
+            (end[0] + head[0], end[1] + head[1]),
+            (end[0] + head[2], end[1] + head[3]), end])
@@ -0,0 +1,174 @@
+import numpy as np
+import pygame
+import cv2
+
+# bytes of the supersampled band drawn at once
+BAND_BYTES = 32 << 20
+
+# rows added around the clocks and lines of a band,
+# for the width of their strokes
+MARGIN = 4
+
+WHITE = 255
+
+
+class Supersampler:
+    """Draws the frames of a scene at any resolution, straight from
+    its clocks, for exporting.
+
+    The board is drawn factor times larger than the exported frames
+    and averaged down to them, so that every line is antialiased.
+    Frames are drawn by horizontal bands of bounded size, each band
+    being averaged down and put over the frame before the next one
+    is drawn, and the clock drawing is kept at the exported
+    resolution only, so that memory stays bounded whatever the
+    resolution and supersampling factor.
+
+    draws frames like a scene, so that they can be drawn
+    by the rasterization pool, the frames being the same
+    whatever frames are drawn first
+
+    """
+
+    def __init__(self, scene, side, factor=1, band_bytes=BAND_BYTES):
+        self._scene = scene.scaled(side * factor)
+        self._side = side
+        self._factor = factor
+
+        # exported rows of every band
+        rows = max(1, band_bytes // (4 * side * factor * factor))
+        self._rows = min(rows, side)
+        self._band = None  # transparent supersampled band
+
+    def __getstate__(self):
+        """leaves the band out of the supersampler
+        sent to worker processes"""
+
+        state = self.__dict__.copy()
+        state["_band"] = None
+        return state
+
+    def size(self):
+        """returns the size of the exported frames"""
+
+        return self._side, self._side
+
+    def colors(self):
+        """returns every color the frames are drawn with"""
+
+        return self._scene.colors()
+
+    def frame_count(self):
+        """returns the number of frames, including the final drawing"""
+
+        return self._scene.frame_count()
+
+    def _bands(self, top, bottom):
+        """yields the first and last exported rows (excluded)
+        of the bands covering the supersampled rows top to bottom"""
+
+        factor = self._factor
+        first = max(0, int(top) // factor - MARGIN)
+        last = min(self._side, int(bottom) // factor + 1 + MARGIN)
+        first -= first % self._rows
+        for start in range(first, last, self._rows):
+            yield start, min(start + self._rows, self._side)
+
+    def _clear_band(self):
+        """returns the band emptied"""
+
+        if self._band is None:
+            self._band = pygame.Surface(
+                (self._side * self._factor, self._rows * self._factor),
+                pygame.SRCALPHA)
+        self._band.fill((0, 0, 0, 0))
+        return self._band
+
+    def _put_band(self, image, start, end):
+        """averages the band down and puts it
+        over rows start to end of an RGB image"""
+
+        band = self._band
+        width, height = band.get_size()
+        pixels = np.frombuffer(pygame.image.tobytes(band, "RGBA"),
+                               dtype=np.uint8).reshape(height, width, 4)
+        pixels = pixels[:(end - start) * self._factor]
+
+        # transparent pixels are black, so averaged colors are
+        # premultiplied by their coverage
+        if self._factor > 1:
+            pixels = cv2.resize(pixels, (self._side, end - start),
+                                interpolation=cv2.INTER_AREA)
+
+        coverage = pixels[:, :, 3:].astype(np.float32) / 255
+        rows = image[start:end]
+        rows[...] = np.minimum(pixels[:, :, :3] + rows * (1 - coverage)
+                               + 0.5, WHITE).astype(np.uint8)
+
+    def _draw_trail(self, trail, start, end):
+        """adds the lines ending at drawing points start to end
+        to the exported clock drawing"""
+
+        if end <= start:
+            return
+
+        factor = self._factor
+        for first, last in self._bands(*self._scene.trail_rows(start, end)):
+            band = self._clear_band()
+            self._scene.draw_trail(band, start, end, (0, first * factor))
+            self._put_band(trail, first, last)
+
+    def _draw_clocks(self, frame, i, proj_center, vector):
+        """draws the clocks of the i-th frame over an exported frame"""
+
+        factor = self._factor
+        centers = np.asarray(proj_center)
+        vectors = np.asarray(vector)
+        radii = np.hypot(vectors[:, 0], vectors[:, 1])
+        top = min(centers[:, 1].min(), (centers[:-1, 1] - radii).min()
+                  if len(radii) else centers[:, 1].min())
+        bottom = max(centers[:, 1].max(), (centers[:-1, 1] + radii).max()
+                     if len(radii) else centers[:, 1].max())
+
+        for first, last in self._bands(top, bottom):
+            band = self._clear_band()
+            offset = 0, first * factor
+            self._scene.draw_clocks(band, i, (centers - offset).tolist(),
+                                    vector, offset)
+            self._put_band(frame, first, last)
+
+    def iter_frames(self, first=0, last=None):
+        """yields new opaque surfaces of every frame
+        from the first one up to the last one (excluded)"""
+
+        if last is None:
+            last = self.frame_count()
+
+        scene = self._scene
+        size = self.size()
+        trail = np.full((self._side, self._side, 3), WHITE, dtype=np.uint8)
+
+        # joints between the lines added for two frames are averaged
+        # down twice, so the clock drawing of the previous frames is
+        # added by the same lines as when drawing every frame
+        drawn = 0
+        for i in range(first):
+            point = scene.frame_point(i)
+            self._draw_trail(trail, drawn, point)
+            drawn = point
+
+        for i, proj_center, vector in scene.geometry(first, last):
+
+            # draw the clocks on top of the clock drawing
+            point = scene.frame_point(i)
+            self._draw_trail(trail, drawn, point)
+            drawn = point
+            frame = trail.copy()
+            self._draw_clocks(frame, i, proj_center, vector)
+
+            yield pygame.image.frombytes(frame.tobytes(), size, "RGB")
+
+        # add a frame with only the final drawing
+        if last == self.frame_count():
+            self._draw_trail(trail, drawn, scene.point_count())
+            yield pygame.image.frombytes(trail.tobytes(), size, "RGB")
@@ -0,0 +1,351 @@
+import abc
+import os
+import queue
+import shutil
+import sys
+import threading
+import numpy as np
+import pygame
+import cv2
+from crisnian_code import gif
+
+FRAME_RATE = 20.0
+FOURCC = "avc1"  # Be sure to use lower case
+
+# frames between two key frames of encoded videos
+KEY_INTERVAL = 40
+
+# number of converted frames waiting for the encoder
+QUEUE_SIZE = 16
+
+# output that streams raw frames to the standard output
+STDOUT = "-"
+
+# default largest difference of a channel value under
+# which a frame repeats the previous one
+HOLD_TOLERANCE = 0
+
+
+def to_pixels(surface, order="RGB"):
+    """returns the pixels of a surface as a new array of shape
+    (height, width, 3) in the RGB or BGR channel order, copying
+    them once straight into the order of the exporters"""
+
+    pixels = pygame.surfarray.pixels3d(surface).transpose(1, 0, 2)
+    if order == "BGR":
+        pixels = pixels[:, :, ::-1]
+    array = np.ascontiguousarray(pixels)
+    del pixels  # unlock the surface
+    return array
+
+
+def same_frame(frame, previous, tolerance=HOLD_TOLERANCE):
+    """checks if an RGB frame repeats the previous one,
+    no channel value differing by more than the tolerance"""
+
+    return previous is not None and frame.shape == previous.shape \
+        and cv2.norm(frame, previous, cv2.NORM_INF) <= tolerance
+
+
+class FrameStream(abc.ABC):
+    """Exports RGB frames in a background thread, fed through
+    a bounded queue so that converting frames and exporting them
+    overlap with a bounded memory use.
+
+    frames are given in the channel order of the stream, shared
+    between streams and never modified, and a frame repeated
+    several times is queued once and held by the stream, as
+    a longer frame where the format allows it or by exporting
+    the same converted frame again otherwise
+
+    """
+
+    ORDER = "RGB"  # channel order of the frames
+
+    def __init__(self, file_path, queue_size=QUEUE_SIZE):
+        self._file_path = file_path
+        self._queue = queue.Queue(queue_size)
+        self._encoded = 0  # number of frames written to the file
+        self._error = None  # error raised by the encoder
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def _encode(self):
+        """writes queued frames until the end of the stream"""
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+            frame, count = item
+
+            # keep any error for the producer, so that it never
+            # waits for a stopped encoder
+            try:
+                self._write(frame, count)
+            except Exception as error:
+                self._error = error
+            self._encoded += count
+        try:
+            self._finish()
+        except Exception as error:
+            if self._error is None:
+                self._error = error
+
+    @abc.abstractmethod
+    def _write(self, frame, count):
+        """exports a frame held for count frames in the encoder thread"""
+
+    def _finish(self):
+        """ends the export in the encoder thread"""
+
+    def _remove(self):
+        """deletes the unfinished export"""
+
+        if os.path.exists(self._file_path):
+            os.remove(self._file_path)
+
+    def write(self, frame, count=1):
+        """queues a frame held for count frames,
+        waiting while the queue is full"""
+
+        if self._error is not None:
+            raise RuntimeError("exporting " + self._file_path + " failed: "
+                               + str(self._error))
+        self._queue.put((frame, count))
+
+    def encoded(self):
+        """returns the number of frames written to the file"""
+
+        return self._encoded
+
+    def close(self):
+        """waits for every queued frame to be written
+        and finishes the file"""
+
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("exporting " + self._file_path + " failed: "
+                               + str(self._error))
+
+    def abort(self):
+        """stops exporting and deletes the unfinished file"""
+
+        # drop the frames still waiting
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put(None)
+        self._thread.join()
+        self._remove()
+
+
+class VideoStream(FrameStream):
+    """Encodes frames into a video file with OpenCV"""
+
+    ORDER = "BGR"
+
+    def __init__(self, file_path, size, fps=FRAME_RATE, fourcc=FOURCC,
+                 queue_size=QUEUE_SIZE, key_interval=KEY_INTERVAL):
+        self._writer = cv2.VideoWriter(
+            file_path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*fourcc), fps,
+            size, [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, key_interval])
+        if not self._writer.isOpened():
+            raise RuntimeError("cannot encode " + fourcc + " video into "
+                               + file_path)
+        super().__init__(file_path, queue_size)
+
+    def _write(self, frame, count):
+        for _ in range(count):
+            self._writer.write(frame)
+
+    def _finish(self):
+        self._writer.release()
+
+
+class GifStream(FrameStream):
+    """Writes frames into an animated gif whose palette is quantized
+    from the colors the frames are drawn with if they are given,
+    from the first frame otherwise"""
+
+    def __init__(self, file_path, size, fps=FRAME_RATE,
+                 queue_size=QUEUE_SIZE, colors=None):
+        try:
+            self._file = open(file_path, "wb")
+        except OSError as error:
+            raise RuntimeError("cannot write gif into " + file_path + ": "
+                               + str(error))
+        self._writer = gif.GifWriter(self._file, size, fps, colors)
+        super().__init__(file_path, queue_size)
+
+    def _write(self, frame, count):
+        self._writer.write(frame, count)
+
+    def _finish(self):
+        if self._error is None:
+            self._writer.close()
+        self._file.close()
+
+
+class PngStream(FrameStream):
+    """Writes every frame into its own lossless png file,
+    numbered after the name of the given file from the first frame"""
+
+    ORDER = "BGR"
+
+    def __init__(self, file_path, size=None, fps=FRAME_RATE,
+                 queue_size=QUEUE_SIZE, first=0):
+        root, extension = os.path.splitext(file_path)
+        self._pattern = root + "_{:05d}" + extension
+        self._first = first
+        directory = os.path.dirname(file_path)
+        if directory != "" and not os.path.isdir(directory):
+            raise RuntimeError("cannot write png files into " + directory)
+        super().__init__(file_path, queue_size)
+
+    def _write(self, frame, count):
+        path = self._pattern.format(self._first + self._encoded)
+        if not cv2.imwrite(path, frame):
+            raise OSError("cannot write " + path)
+
+        # held frames are copies of the file
+        for i in range(1, count):
+            shutil.copyfile(path, self._pattern.format(
+                self._first + self._encoded + i))
+
+    def _remove(self):
+        for i in range(self._encoded):
+            path = self._pattern.format(self._first + i)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class RawStream(FrameStream):
+    """Streams the bytes of every RGB frame to a binary file,
+    the standard output by default"""
+
+    def __init__(self, file_path=STDOUT, size=None, fps=FRAME_RATE,
+                 queue_size=QUEUE_SIZE):
+        if file_path == STDOUT:
+            self._file = sys.stdout.buffer
+        else:
+            try:
+                self._file = open(file_path, "wb")
+            except OSError as error:
+                raise RuntimeError("cannot write frames into " + file_path
+                                   + ": " + str(error))
+        super().__init__(file_path, queue_size)
+
+    def _write(self, frame, count):
+        for _ in range(count):
+            self._file.write(frame.data)
+
+    def _finish(self):
+        self._file.flush()
+        if self._file_path != STDOUT:
+            self._file.close()
+
+    def _remove(self):
+        if self._file_path != STDOUT:
+            super()._remove()
+
+
+class RunWriter:
+    """Writes frames into several streams, each run of repeated
+    frames being written once as a frame held for the whole run
+    when the run ends, so that streams never export a repeated
+    frame again.
+
+    every frame is converted once into each channel order
+    of the streams, and the conversions are shared by them
+
+    """
+
+    def __init__(self, streams, tolerance=HOLD_TOLERANCE):
+        self._streams = streams
+        self._tolerance = tolerance
+        self._orders = sorted({stream.ORDER for stream in streams})
+        self._frames = None  # frame of the current run in every order
+        self._count = 0  # frames of the current run
+
+    def write(self, surface):
+        """adds the frame drawn on a surface to the current run
+        or starts a new one"""
+
+        order = self._orders[0]
+        frame = to_pixels(surface, order)
+        previous = None if self._frames is None else self._frames[order]
+        if same_frame(frame, previous, self._tolerance):
+            self._count += 1
+            return
+
+        self._flush()
+        self._frames = {order: frame}
+        for other in self._orders[1:]:
+            self._frames[other] = to_pixels(surface, other)
+        self._count = 1
+
+    def _flush(self, hold=0):
+        """writes the current run held for hold more frames"""
+
+        if self._frames is not None:
+            for stream in self._streams:
+                stream.write(self._frames[stream.ORDER], self._count + hold)
+
+    def finish(self, hold=0):
+        """writes the last run, the last frame
+        being held for hold more frames"""
+
+        self._flush(hold)
+        self._frames = None
+        self._count = 0
+
+
+# stream class and options of every exported file extension
+FORMATS = {
+    ".mp4": (VideoStream, {"fourcc": FOURCC}),
+    ".webm": (VideoStream, {"fourcc": "VP90"}),
+    ".gif": (GifStream, {}),
+    ".png": (PngStream, {}),
+    ".rgb": (RawStream, {}),
+}
+
+
+def check_format(file_path):
+    """raises RuntimeError if the format of a file cannot be exported"""
+
+    extension = os.path.splitext(file_path)[1].lower()
+    if file_path != STDOUT and extension not in FORMATS:
+        raise RuntimeError("cannot export " + file_path + ": supported "
+                           "formats are " + ", ".join(FORMATS))
+
+
+def open_stream(file_path, size, fps=FRAME_RATE, first=0, colors=None):
+    """returns a new stream exporting into a file
+    in the format of its extension, or raw frames
+    to the standard output for "-"
+
+    png sequences are numbered from the first frame, and gif palettes
+    are built from the given colors the frames are drawn with
+
+    raises RuntimeError if the format is not supported
+
+    """
+
+    check_format(file_path)
+    if file_path == STDOUT:
+        return RawStream(STDOUT, size, fps)
+
+    extension = os.path.splitext(file_path)[1].lower()
+    stream_class, options = FORMATS[extension]
+    if stream_class is PngStream:
+        options = dict(options, first=first)
+    elif stream_class is GifStream:
+        options = dict(options, colors=colors)
+
+    return stream_class(file_path, size, fps, **options)
@@ -1,6 +1,13 @@
+import os
+
+# keep the standard output free for raw frames
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
 from pygui import gui, input_manager as i_m
 from crisnian_code import crisnian_layer as c_l
-import os
+from crisnian_code import headless as h_l
+import argparse
+import sys
 
 
 FONT_TYPE = "Arial"
@@ -13,6 +20,24 @@ FRAME_RATE = 30
 
 def main():
 
+    parser = argparse.ArgumentParser(
+        description="Animates drawings with Fourier series clocks.")
+    commands = parser.add_subparsers(dest="command")
+    render_parser = commands.add_parser(
+        "render", help="render an svg file into a video without a display")
+    h_l.add_arguments(render_parser)
+    args = parser.parse_args()
+
+    # render without the interactive window
+    if args.command == "render":
+        sys.exit(h_l.run(args))
+
+    interactive()
+
+
+def interactive():
+    """runs the interactive window"""
+
     # initialize GUI object
     g_u_i = gui.GUI(GUI_TITLE, (GUI_WIDTH, GUI_HEIGHT), FRAME_RATE)
     g_u_i.set_font(FONT_TYPE, FONT_SIZE)